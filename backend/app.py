@@ -1,7 +1,9 @@
 from flask import Flask
 from config import Config
-from extensions import db, migrate, login_manager, cors
+from extensions import db, migrate, login_manager, cors, response_cache, instrumentation, principal_cache
 import models # Ensure models are imported
+import db_routing
+import static_export
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -9,21 +11,51 @@ def create_app(config_class=Config):
 
     # Initialize extensions
     db.init_app(app)
+    db_routing.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     cors.init_app(app)
 
+    from compression import compressor
+    compressor.init_app(app)
+
+    response_cache.init_app(app)
+    instrumentation.init_app(app)
+    principal_cache.init_app(app)
+
+    from passwords import password_hasher
+    password_hasher.init_app(app)
+
+    from fragments import fragment_cache
+    fragment_cache.init_app(app)
+
+    from settings_store import settings_store
+    settings_store.init_app(app)
+
+    from comment_queue import comment_ingestor
+    comment_ingestor.init_app(app)
+
+    from view_counter import view_counter
+    view_counter.init_app(app)
+
+    static_export.init_app(app)
+
     # Register blueprints
     from routes.auth import auth_bp
     from routes.article import article_bp
     from routes.category import category_bp
     from routes.comment import comment_bp
     from routes.settings import settings_bp
+    from routes.admin import admin_bp
     app.register_blueprint(auth_bp)
     app.register_blueprint(article_bp)
     app.register_blueprint(category_bp)
     app.register_blueprint(comment_bp)
     app.register_blueprint(settings_bp)
+    app.register_blueprint(admin_bp)
+
+    from commands import register_commands
+    register_commands(app)
     
     @app.route('/')
     def index():
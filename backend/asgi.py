@@ -0,0 +1,213 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+from werkzeug.exceptions import HTTPException
+from extensions import db, instrumentation
+from db_routing import SAFE_METHODS, _reads_from_replica
+
+# Public read views served on the event loop; everything else runs in threads
+ASYNC_ENDPOINTS = frozenset({
+    'article.get_articles',
+    'article.search_articles',
+    'article.get_article',
+    'article.get_trending_articles',
+    'category.get_categories',
+    'comment.get_comments',
+    'settings.get_settings',
+})
+
+# Async DBAPI standing in for the configured driver of each backend
+ASYNC_DRIVERS = {'sqlite': 'aiosqlite', 'mysql': 'aiomysql', 'postgresql': 'asyncpg'}
+
+def async_url(url):
+    """The same database as `url`, reached through an async driver."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver known for {backend}')
+    if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+        raise ValueError('In-memory SQLite cannot be shared between the sync and async engines')
+    return url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}')
+
+class _ReadSession(Session):
+    """Sync face of a request's AsyncSession, routed like RoutingSession."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if replica is not None and bind is None and not self._flushing and _reads_from_replica():
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+class AsgiApp:
+    """ASGI entry point for `app`.
+
+    GETs of ASYNC_ENDPOINTS run the regular Flask views inside an
+    AsyncSession on the event loop: db.session is the sync face of that
+    session, so each query yields to the loop instead of holding a thread,
+    and slow clients cost a coroutine rather than a worker. Caching, ETags,
+    replica routing and after_request hooks are the same code as under WSGI,
+    so responses are identical. Other requests (writes, auth, admin) run the
+    WSGI app in a pool of ASGI_WSGI_THREADS threads.
+    """
+
+    def __init__(self, app):
+        app.config.setdefault('ASGI_WSGI_THREADS', 16)
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+        with app.app_context():
+            self.engines = {
+                key: create_async_engine(async_url(engine.url), **options) for key, engine in db.engines.items()
+            }
+        if 'instrumentation' in app.extensions:
+            for engine in self.engines.values():
+                instrumentation.watch(engine.sync_engine)
+        replica = self.engines.get('replica')
+        self.sessions = async_sessionmaker(
+            self.engines[None],
+            sync_session_class=_ReadSession,
+            info={'replica': replica.sync_engine if replica is not None else None}
+        )
+        self.executor = ThreadPoolExecutor(app.config['ASGI_WSGI_THREADS'], thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+        environ = _environ(scope, await _read_body(receive))
+        if self._on_loop(environ):
+            await self._dispatch(environ, send)
+        else:
+            loop = asyncio.get_running_loop()
+
+            def send_from_thread(message):
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+            await loop.run_in_executor(self.executor, _call_wsgi, self.wsgi_app, environ, send_from_thread)
+
+    def _on_loop(self, environ):
+        if environ['REQUEST_METHOD'] not in SAFE_METHODS:
+            return False
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            # 404s, 405s and redirects are left to Flask
+            return False
+        return endpoint in ASYNC_ENDPOINTS
+
+    async def _dispatch(self, environ, send):
+        async with self.sessions() as session:
+            await session.run_sync(self._run_view, environ, send)
+
+    def _run_view(self, session, environ, send):
+        # Runs in a greenlet where blocking-style database calls and sends
+        # are awaited on the loop; the app context makes db.session this
+        # session, and stays up while a streamed body is produced
+        with self.app.app_context():
+            db.session.registry.set(session)
+            _call_wsgi(self.wsgi_app, environ, lambda message: await_only(send(message)))
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def aclose(self):
+        for engine in self.engines.values():
+            await engine.dispose()
+        self.executor.shutdown(wait=False)
+
+def create_asgi_app(config_class=None):
+    """Factory for ASGI servers, e.g. `uvicorn --factory asgi:create_asgi_app`."""
+    from app import create_app
+    from config import Config
+
+    return AsgiApp(create_app(config_class or Config))
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+def _environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI strings carry the raw bytes as latin-1
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+def _call_wsgi(wsgi_app, environ, send):
+    """Run a WSGI app, passing its response to `send` as ASGI messages.
+
+    `send` blocks until the message is handed to the server, so a streamed
+    body goes out chunk by chunk as the app produces it.
+    """
+    started = []
+
+    def start():
+        status, headers = started.pop()
+        send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+
+    def write(chunk):
+        if started:
+            start()
+        send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [(status, headers)]
+        return write
+
+    iterable = wsgi_app(environ, start_response)
+    try:
+        for chunk in iterable:
+            if chunk:
+                write(chunk)
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+    if started:
+        start()
+    send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,263 @@
+import hashlib
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, request
+from compression import compressor
+
+class CacheBackend:
+    """Storage for the response cache.
+
+    Values are opaque to the backend. `ttl` is in seconds; None means the
+    backend default. Backends may drop entries at any time, a miss is always
+    safe.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+class NullBackend(CacheBackend):
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+class LRUBackend(CacheBackend):
+    """In-process LRU with a size bound and per-entry expiry.
+
+    Each worker process has its own copy, so writes in one worker only
+    invalidate that worker; other workers catch up within the TTL.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+class RedisBackend(CacheBackend):
+    """Shared backend for anything speaking the Redis GET/SET/DEL commands.
+
+    `client` needs `get(key)`, `set(key, value, ex=seconds)` and
+    `delete(key)`, which redis-py and most local stand-ins provide.
+    """
+
+    def __init__(self, client, ttl=300, prefix='blog:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one.
+
+    The first caller runs `fn`; callers arriving while it runs wait and share
+    its result, so a cold key costs one computation instead of a stampede.
+    If the first caller fails, the waiters fall back to running `fn` alone.
+    Callers on the leader's own thread never wait: under the ASGI entry
+    point many requests share the event loop thread, and blocking it would
+    also stop the leader.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {
+                    'done': threading.Event(), 'result': None, 'ok': False, 'thread': threading.get_ident()
+                }
+
+        if not leader:
+            if call['thread'] == threading.get_ident():
+                return fn()
+            call['done'].wait()
+            return call['result'] if call['ok'] else fn()
+
+        try:
+            call['result'] = fn()
+            call['ok'] = True
+            return call['result']
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+# Headers worth replaying from a cached 200
+_CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Vary')
+
+class ResponseCache:
+    """Cache for public GET responses, keyed by route, query and viewer role.
+
+    Keys live under namespaces (e.g. 'articles', 'article:3'). Each namespace
+    has a generation token that is part of every key, so invalidating a
+    namespace is a single write that makes all of its keys unreachable; the
+    orphaned entries age out through LRU or TTL.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', 'lru')
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('RESPONSE_CACHE_TTL', 300)
+        app.config.setdefault('RESPONSE_CACHE_REDIS_URL', None)
+
+        kind = app.config['RESPONSE_CACHE_BACKEND']
+        ttl = app.config['RESPONSE_CACHE_TTL']
+        if isinstance(kind, CacheBackend):
+            backend = kind
+        elif kind == 'lru':
+            backend = LRUBackend(app.config['RESPONSE_CACHE_MAX_ENTRIES'], ttl)
+        elif kind == 'redis':
+            backend = RedisBackend.from_url(app.config['RESPONSE_CACHE_REDIS_URL'], ttl=ttl)
+        elif kind in ('null', None):
+            backend = NullBackend()
+        else:
+            raise ValueError(f'Unknown RESPONSE_CACHE_BACKEND: {kind!r}')
+
+        app.extensions['response_cache'] = {'backend': backend, 'flight': SingleFlight()}
+
+    @property
+    def backend(self):
+        return current_app.extensions['response_cache']['backend']
+
+    def _generation(self, namespace):
+        key = f'gen:{namespace}'
+        generation = self.backend.get(key)
+        if generation is None:
+            # Missing or evicted: a fresh token can only cause misses
+            generation = uuid.uuid4().hex[:12]
+            self.backend.set(key, generation, ttl=0)
+        return generation
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.set(f'gen:{namespace}', uuid.uuid4().hex[:12], ttl=0)
+
+    def _key(self, namespace):
+        from http_cache import viewer_role
+        query = urlencode(sorted(request.args.items(multi=True)))
+        digest = hashlib.sha1(query.encode('utf-8')).hexdigest()
+        return f'resp:{namespace}:{self._generation(namespace)}:{request.endpoint}:{viewer_role()}:{digest}'
+
+    def cached(self, namespace):
+        """Cache 200 responses of a GET view.
+
+        `namespace` is a string or a callable taking the view arguments and
+        returning one, for views whose data splits by id.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                from db_routing import pinned_to_primary
+                if pinned_to_primary():
+                    # Entries may have been filled from a lagging replica;
+                    # a client that just wrote reads around them
+                    return view(*args, **kwargs)
+
+                ns = namespace(**kwargs) if callable(namespace) else namespace
+                key = self._key(ns)
+                entry = self.backend.get(key)
+                if entry is not None:
+                    return self._replay(entry)
+
+                # Only a 200 is stored; anything else (304, 403, 404) goes
+                # back to the request that produced it.
+                uncacheable = []
+                def compute():
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        uncacheable.append(response)
+                        return None
+                    entry = {
+                        'status': response.status_code,
+                        'headers': [(h, response.headers[h]) for h in _CACHED_HEADERS if h in response.headers],
+                        'body': response.get_data(),
+                        # Compressed once here rather than on every hit
+                        'encoded': compressor.variants(response)
+                    }
+                    self.backend.set(key, entry)
+                    return entry
+
+                entry = current_app.extensions['response_cache']['flight'].do(key, compute)
+                if entry is not None:
+                    return self._replay(entry)
+                if uncacheable:
+                    return uncacheable[0]
+                # The request we waited on was not cacheable, run our own
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _replay(self, entry):
+        response = current_app.response_class(entry['body'], status=entry['status'], headers=entry['headers'])
+        encoded = entry.get('encoded') or {}
+        encoding = compressor.negotiate(encoded) if encoded else None
+        if encoding is not None:
+            compressor.apply(response, encoding, encoded[encoding])
+        # A cached ETag still answers If-None-Match without touching the DB
+        return response.make_conditional(request)
@@ -0,0 +1,126 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, update
+from extensions import db
+from models import Article
+import counters
+import rendering
+import search
+import static_export
+import transfer
+
+@click.command('repair-counters')
+@with_appcontext
+def repair_counters():
+    """Recompute the maintained counters from the source tables."""
+    counters.rebuild_category_counts()
+    counters.rebuild_comment_counts()
+    counters.rebuild_rollups()
+    db.session.commit()
+    click.echo('Category article counts, article comment counts and dashboard rollups rebuilt.')
+
+@click.command('render-articles')
+@click.option('--workers', default=None, type=int, help='Renderer processes (default: CPU count).')
+@click.option('--batch-size', default=200, show_default=True)
+@click.option('--force', is_flag=True, help='Re-render even if the content hash matches.')
+@with_appcontext
+def render_articles(workers, batch_size, force):
+    """Backfill the cached HTML and TOC for existing articles."""
+    rendered = 0
+    last_id = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = db.session.execute(
+                select(Article.id, Article.content, Article.content_hash)
+                .where(Article.id > last_id)
+                .order_by(Article.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            stale = []
+            for row in rows:
+                digest = rendering.content_hash(row.content)
+                if force or row.content_hash != digest:
+                    stale.append((row.id, row.content, digest))
+            if not stale:
+                continue
+
+            # Rendering is CPU bound, so it runs across processes; the
+            # writes stay here as one executemany per batch.
+            outputs = pool.map(rendering.render_markdown, [content for _, content, _ in stale])
+            params = [
+                {'id': id, 'content_html': html, 'toc': json.dumps(toc, ensure_ascii=False), 'content_hash': digest}
+                for (id, _, digest), (html, toc) in zip(stale, outputs)
+            ]
+            db.session.execute(update(Article), params)
+            db.session.commit()
+            rendered += len(params)
+
+    click.echo(f'Rendered {rendered} articles.')
+
+@click.command('reindex-search')
+@click.option('--batch-size', default=500, show_default=True)
+@with_appcontext
+def reindex_search(batch_size):
+    """Rebuild the article search index from scratch."""
+    indexed = search.rebuild(batch_size=batch_size)
+    click.echo(f'Indexed {indexed} articles.')
+
+@click.command('export-static')
+@click.argument('out_dir', required=False, type=click.Path(file_okay=False))
+@click.option('--workers', default=None, type=int, help='Exporter processes (default: CPU count, 0 for none).')
+@click.option('--per-page', default=10, show_default=True)
+@click.option('--force', is_flag=True, help='Re-export everything, ignoring the last run.')
+@with_appcontext
+def export_static(out_dir, workers, per_page, force):
+    """Export the published blog as static JSON and HTML."""
+    out_dir = out_dir or current_app.config['STATIC_EXPORT_DIR']
+    if not out_dir:
+        raise click.UsageError('Pass OUT_DIR or set STATIC_EXPORT_DIR.')
+    result = static_export.export(out_dir, workers=workers, per_page=per_page, force=force, log=click.echo)
+    click.echo(f"Exported {result['articles']} articles, removed {result['removed']}, "
+               f"wrote {result['listing_files']} listing files to {out_dir}.")
+
+@click.command('export-content')
+@click.argument('out', default='-', type=click.File('w', encoding='utf-8'))
+@click.option('--batch-size', default=transfer.BATCH_SIZE, show_default=True)
+@with_appcontext
+def export_content(out, batch_size):
+    """Write users, categories, articles and comments as NDJSON (default: stdout)."""
+    for line in transfer.export_lines(batch_size=batch_size):
+        out.write(line)
+
+@click.command('import-content')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--dry-run', is_flag=True, help='Validate and count, then roll everything back.')
+@click.option('--batch-size', default=transfer.BATCH_SIZE, show_default=True)
+@with_appcontext
+def import_content(source, dry_run, batch_size):
+    """Import an `export-content` file; rerun it to resume after a failure."""
+    try:
+        report = transfer.import_lines(source, dry_run=dry_run, batch_size=batch_size, log=click.echo)
+    except ValueError as exc:
+        raise click.UsageError(str(exc))
+    except transfer.ImportInterrupted as exc:
+        raise click.ClickException(str(exc))
+    for message in report['errors']:
+        click.echo(message, err=True)
+    names = {'user': 'users', 'category': 'categories', 'article': 'articles', 'comment': 'comments'}
+    summary = ', '.join(f"{report['inserted'][kind]} {names[kind]}" for kind in transfer.KINDS)
+    click.echo(f"{'Would import' if dry_run else 'Imported'} {summary}; merged "
+               f"{sum(report['merged'].values())} existing, skipped {sum(report['skipped'].values())} "
+               f"already imported, {report['error_count']} invalid.")
+
+def register_commands(app):
+    app.cli.add_command(repair_counters)
+    app.cli.add_command(render_articles)
+    app.cli.add_command(reindex_search)
+    app.cli.add_command(export_static)
+    app.cli.add_command(export_content)
+    app.cli.add_command(import_content)
@@ -0,0 +1,173 @@
+import atexit
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert
+from extensions import db, response_cache
+from models import Comment
+from counters import adjust_comment_counts, count_rows
+
+# Columns a queued item carries into the INSERT
+_COLUMNS = ('content', 'article_id', 'user_id', 'status', 'created_at')
+
+class CommentIngestor:
+    """Write-behind queue for new comments.
+
+    With COMMENT_INGEST_MODE = 'queued', create_comment validates a comment,
+    hands it to submit() and answers 202 with a pending id. A writer thread
+    inserts queued comments with one executemany per batch, as soon as
+    COMMENT_BATCH_SIZE are waiting or the oldest has waited
+    COMMENT_BATCH_MAX_AGE seconds. The queue is drained at interpreter exit;
+    a process that is killed outright loses what it still holds.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMMENT_INGEST_MODE', 'direct')
+        app.config.setdefault('COMMENT_BATCH_SIZE', 100)
+        app.config.setdefault('COMMENT_BATCH_MAX_AGE', 0.5)
+        app.extensions['comment_ingestor'] = _Writer(app)
+
+    @property
+    def _writer(self):
+        return current_app.extensions['comment_ingestor']
+
+    @property
+    def enabled(self):
+        return current_app.config['COMMENT_INGEST_MODE'] == 'queued'
+
+    def submit(self, **fields):
+        """Queue one validated comment and return its pending id."""
+        return self._writer.submit(fields)
+
+    def queued(self):
+        """Comments accepted but not yet committed, oldest first."""
+        return self._writer.snapshot()
+
+    def drain(self):
+        """Write everything queued so far in the calling thread."""
+        self._writer.drain()
+
+class _Writer:
+    def __init__(self, app):
+        self.app = app
+        self.items = deque()
+        self.in_flight = []
+        self.cond = threading.Condition()
+        # Held while a batch is taken and written, so the writer thread and
+        # drain() never insert the same items or interleave batches.
+        self.write_lock = threading.Lock()
+        self.thread = None
+        self.stopping = False
+
+    def submit(self, fields):
+        item = dict(fields, pending_id=uuid.uuid4().hex, queued_at=time.monotonic())
+        item.setdefault('created_at', datetime.utcnow())
+        with self.cond:
+            self.items.append(item)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='comment-writer', daemon=True)
+                self.thread.start()
+                atexit.register(self.stop)
+            self.cond.notify()
+        return item['pending_id']
+
+    def snapshot(self):
+        with self.cond:
+            return list(self.in_flight) + list(self.items)
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+        self.drain()
+
+    def drain(self):
+        with self.write_lock:
+            while True:
+                batch = self._take()
+                if not batch:
+                    return
+                self._write(batch)
+
+    def _run(self):
+        while True:
+            if not self._wait_due():
+                return
+            with self.write_lock:
+                batch = self._take()
+                if batch:
+                    self._write(batch)
+
+    def _wait_due(self):
+        """Block until a batch is due; False once stopping."""
+        size = self.app.config['COMMENT_BATCH_SIZE']
+        max_age = self.app.config['COMMENT_BATCH_MAX_AGE']
+        with self.cond:
+            while not self.stopping:
+                if len(self.items) >= size:
+                    return True
+                if self.items:
+                    remaining = self.items[0]['queued_at'] + max_age - time.monotonic()
+                    if remaining <= 0:
+                        return True
+                    self.cond.wait(remaining)
+                else:
+                    self.cond.wait()
+            return False
+
+    def _take(self):
+        size = self.app.config['COMMENT_BATCH_SIZE']
+        with self.cond:
+            self.in_flight = [self.items.popleft() for _ in range(min(size, len(self.items)))]
+            return list(self.in_flight)
+
+    def _write(self, batch):
+        with self.app.app_context():
+            try:
+                _insert(batch)
+            except Exception:
+                db.session.rollback()
+                # One bad row (say, its article was deleted meanwhile) must
+                # not take the rest of the batch down with it
+                self.app.logger.exception('Batch of %d queued comments failed, retrying one by one', len(batch))
+                for item in batch:
+                    try:
+                        _insert([item])
+                    except Exception:
+                        db.session.rollback()
+                        self.app.logger.exception('Dropped queued comment %s', item['pending_id'])
+            finally:
+                db.session.remove()
+        with self.cond:
+            self.in_flight = []
+
+def _insert(batch):
+    rows = []
+    deltas = {}
+    for item in batch:
+        row = {column: item[column] for column in _COLUMNS}
+        row['updated_at'] = row['created_at']
+        rows.append(row)
+        if row['status'] == 'approved':
+            deltas[row['article_id']] = deltas.get(row['article_id'], 0) + 1
+
+    db.session.execute(insert(Comment), rows)
+    adjust_comment_counts(deltas)
+    count_rows('comment', [(row['created_at'], row['status']) for row in rows])
+    db.session.commit()
+
+    namespaces = {f"comments:{row['article_id']}" for row in rows}
+    if deltas:
+        namespaces.add('articles')
+    response_cache.invalidate('comments:all', *namespaces)
+
+comment_ingestor = CommentIngestor()
@@ -0,0 +1,127 @@
+import gzip
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def _encodings():
+    # In order of preference when the client rates them equally
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def _compressible(response):
+    return (
+        response.status_code == 200
+        and 'Content-Encoding' not in response.headers
+        and not response.direct_passthrough
+        and (response.mimetype == 'application/json' or response.mimetype.startswith('text/'))
+    )
+
+class Compressor:
+    """gzip and (with the brotli package) br for JSON and text responses.
+
+    The encoding is negotiated from Accept-Encoding. Bodies under
+    COMPRESS_MIN_SIZE bytes are sent as they are, streamed bodies are
+    compressed chunk by chunk as they are produced. The response cache
+    stores every encoding of an entry when it fills it, see `variants`, so
+    cache hits are served without compressing again. A compressed response
+    gets a weak ETag, which If-None-Match still matches.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+        if app.config['COMPRESS_ENABLED']:
+            app.after_request(self._compress)
+
+    @property
+    def enabled(self):
+        return current_app.config['COMPRESS_ENABLED']
+
+    def negotiate(self, offered=None):
+        """Best encoding the client accepts, among `offered` if given."""
+        if not self.enabled:
+            return None
+        best = None
+        for encoding in _encodings():
+            if offered is not None and encoding not in offered:
+                continue
+            quality = request.accept_encodings[encoding]
+            if quality > 0 and (best is None or quality > best[0]):
+                best = (quality, encoding)
+        return best[1] if best is not None else None
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=current_app.config['COMPRESS_BROTLI_QUALITY'])
+        # mtime=0 keeps the output identical for identical input
+        return gzip.compress(data, compresslevel=current_app.config['COMPRESS_LEVEL'], mtime=0)
+
+    def variants(self, response):
+        """Every encoding of a buffered response, for the response cache."""
+        if not self.enabled or not _compressible(response):
+            return {}
+        data = response.get_data()
+        if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+            return {}
+        return {encoding: self.compress(data, encoding) for encoding in _encodings()}
+
+    def apply(self, response, encoding, data=None):
+        """Mark `response` as `encoding`; `data` is its body already encoded."""
+        if data is not None:
+            response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            # The bytes differ from the identity response's
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _compress(self, response):
+        if not _compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            response.response = self._stream(response.response, encoding)
+            return self.apply(response, encoding)
+        data = response.get_data()
+        if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+            return response
+        return self.apply(response, encoding, self.compress(data, encoding))
+
+    def _stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=current_app.config['COMPRESS_BROTLI_QUALITY'])
+            process, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(current_app.config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+            process, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+        def generate():
+            try:
+                for chunk in chunks:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    # Flush per chunk so the client sees data as it is produced
+                    data = process(chunk) + flush()
+                    if data:
+                        yield data
+                yield finish()
+            finally:
+                if hasattr(chunks, 'close'):
+                    chunks.close()
+        return generate()
+
+compressor = Compressor()
@@ -0,0 +1,226 @@
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func, insert, literal, select, update
+from extensions import db
+from models import Article, CategoryArticleCount, Comment, DailyCount, StatusCount, User
+
+# Tables counted in the dashboard rollups; users have no status
+ROLLUP_MODELS = {'article': Article, 'comment': Comment, 'user': User}
+
+def adjust_category_count(category_id, status, delta):
+    """Add `delta` to the stored article count for (category, status).
+
+    Runs inside the caller's transaction, so the counter commits or rolls back
+    together with the article write that caused it.
+    """
+    if category_id is None or status is None or not delta:
+        return
+
+    _increment(CategoryArticleCount, [{'category_id': category_id, 'status': status, 'count': delta}])
+
+def _increment(model, rows):
+    """Add each row's `count` to the stored count under the same primary key.
+
+    Positive counts go in as one upsert, so two transactions creating the
+    same bucket cannot both insert it. Negative ones only update: a missing
+    bucket means the counter is already off, and a negative row would hide
+    that until the next rebuild.
+    """
+    table = model.__table__
+    keys = [column.name for column in table.primary_key]
+    decrements = [row for row in rows if row['count'] < 0]
+    increments = [row for row in rows if row['count'] > 0]
+    if decrements:
+        # Bound under other names: SET count = ... reserves the column names
+        db.session.execute(
+            update(table)
+            .where(*(table.c[key] == bindparam(f'key_{key}') for key in keys))
+            .values(count=table.c.count + bindparam('delta')),
+            [{'delta': row['count'], **{f'key_{key}': row[key] for key in keys}} for row in decrements]
+        )
+    if not increments:
+        return
+
+    stmt = _upsert_statement(table, keys, increments)
+    if stmt is not None:
+        db.session.execute(stmt)
+        return
+    for row in increments:
+        result = db.session.execute(
+            update(table).where(*(table.c[key] == row[key] for key in keys))
+            .values(count=table.c.count + row['count'])
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(table).values(**row))
+
+def _upsert_statement(table, keys, rows):
+    """INSERT `rows`, adding to the count of those already there; None if the dialect cannot."""
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table).values(rows)
+        return stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted.count)
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(rows)
+        return stmt.on_conflict_do_update(index_elements=keys, set_={'count': table.c.count + stmt.excluded.count})
+    return None
+
+def move_category_count(before, after):
+    """Move one article between (category_id, status) buckets."""
+    if before == after:
+        return
+    adjust_category_count(*before, -1)
+    adjust_category_count(*after, 1)
+
+def category_counts(status=None):
+    """Return {category_id: {status: count}} in a single query."""
+    query = select(CategoryArticleCount.category_id, CategoryArticleCount.status, CategoryArticleCount.count)
+    if status:
+        query = query.where(CategoryArticleCount.status == status)
+
+    counts = {}
+    for category_id, row_status, count in db.session.execute(query):
+        counts.setdefault(category_id, {})[row_status] = count
+    return counts
+
+def rebuild_category_counts():
+    db.session.execute(CategoryArticleCount.__table__.delete())
+    db.session.execute(
+        insert(CategoryArticleCount).from_select(
+            ['category_id', 'status', 'count'],
+            select(Article.category_id, Article.status, func.count())
+            .where(Article.category_id.isnot(None))
+            .group_by(Article.category_id, Article.status)
+        )
+    )
+
+def adjust_comment_count(article_id, delta):
+    """Add `delta` to an article's approved comment count.
+
+    Leaves updated_at alone: a new comment is not an edit of the article.
+    """
+    if article_id is None or not delta:
+        return
+
+    db.session.execute(
+        update(Article)
+        .where(Article.id == article_id)
+        .values(comment_count=Article.comment_count + delta, updated_at=Article.updated_at)
+    )
+
+def adjust_comment_counts(deltas):
+    """Apply {article_id: delta} in one executemany UPDATE."""
+    rows = [{'article_id': article_id, 'delta': delta} for article_id, delta in deltas.items()
+            if article_id is not None and delta]
+    if not rows:
+        return
+
+    db.session.execute(
+        update(Article.__table__)
+        .where(Article.__table__.c.id == bindparam('article_id'))
+        .values(comment_count=Article.__table__.c.comment_count + bindparam('delta'),
+                updated_at=Article.__table__.c.updated_at),
+        rows
+    )
+
+def move_comment_count(article_id, before, after):
+    """Account for a comment going from status `before` to `after`."""
+    was, now = before == 'approved', after == 'approved'
+    if was != now:
+        adjust_comment_count(article_id, 1 if now else -1)
+
+def rebuild_comment_counts():
+    approved = (
+        select(func.count())
+        .where(Comment.article_id == Article.id, Comment.status == 'approved')
+        .scalar_subquery()
+    )
+    db.session.execute(update(Article).values(comment_count=approved, updated_at=Article.updated_at))
+
+def _adjust_rollup(model, key, column, deltas):
+    _increment(model, [{**key, column: value, 'count': delta}
+                       for value, delta in deltas.items() if value is not None and delta])
+
+def adjust_status_counts(kind, deltas):
+    """Apply {status: delta} to the stored per-status totals of `kind`.
+
+    Like the other counters this runs inside the caller's transaction.
+    """
+    _adjust_rollup(StatusCount, {'kind': kind}, 'status', deltas)
+
+def move_status_count(kind, before, after):
+    """Move one `kind` row from status `before` to `after`."""
+    if before != after:
+        adjust_status_counts(kind, {before: -1, after: 1})
+
+def adjust_daily_counts(kind, deltas):
+    """Apply {date: delta} to the stored per-day creation counts of `kind`."""
+    _adjust_rollup(DailyCount, {'kind': kind}, 'day', deltas)
+
+def count_rows(kind, rows, sign=1):
+    """Add (sign=1) or remove (sign=-1) `kind` rows in the rollups.
+
+    `rows` are (created_at, status) pairs; status is None for users. A
+    created_at of None stands for now, for rows not flushed yet.
+    """
+    days, statuses = {}, {}
+    for created_at, status in rows:
+        day = (created_at or datetime.utcnow()).date()
+        days[day] = days.get(day, 0) + sign
+        if status is not None:
+            statuses[status] = statuses.get(status, 0) + sign
+    adjust_daily_counts(kind, days)
+    adjust_status_counts(kind, statuses)
+
+def status_counts():
+    """Return {kind: {status: count}} in a single query."""
+    counts = {kind: {} for kind in ROLLUP_MODELS if kind != 'user'}
+    # Buckets emptied by updates stay behind at zero until a rebuild
+    rows = db.session.execute(
+        select(StatusCount.kind, StatusCount.status, StatusCount.count).where(StatusCount.count != 0)
+    )
+    for kind, status, count in rows:
+        counts.setdefault(kind, {})[status] = count
+    return counts
+
+def daily_counts(days):
+    """Return [{'date', 'article', 'comment', 'user'}] for the last `days` UTC days.
+
+    Oldest first; days without rows are filled with zeros.
+    """
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    series = {start + timedelta(days=i): dict.fromkeys(ROLLUP_MODELS, 0) for i in range(days)}
+    rows = db.session.execute(
+        select(DailyCount.day, DailyCount.kind, DailyCount.count).where(DailyCount.day >= start)
+    )
+    for day, kind, count in rows:
+        if day in series and kind in ROLLUP_MODELS:
+            series[day][kind] = count
+    return [{'date': day.isoformat(), **counts} for day, counts in series.items()]
+
+def rebuild_rollups():
+    db.session.execute(StatusCount.__table__.delete())
+    db.session.execute(DailyCount.__table__.delete())
+    for kind, model in ROLLUP_MODELS.items():
+        if kind != 'user':
+            db.session.execute(
+                insert(StatusCount).from_select(
+                    ['kind', 'status', 'count'],
+                    select(literal(kind), model.status, func.count())
+                    .where(model.status.isnot(None))
+                    .group_by(model.status)
+                )
+            )
+        day = func.date(model.created_at)
+        db.session.execute(
+            insert(DailyCount).from_select(
+                ['day', 'kind', 'count'],
+                select(day, literal(kind), func.count())
+                .where(model.created_at.isnot(None))
+                .group_by(day)
+            )
+        )
@@ -0,0 +1,85 @@
+import time
+from flask import current_app, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+# Blueprints whose GETs may be answered from the replica
+REPLICA_BLUEPRINTS = frozenset({'article', 'category', 'comment', 'settings'})
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+def engine_options(uri, pool_size=10, max_overflow=20, pool_timeout=10, pool_recycle=280):
+    """SQLALCHEMY_ENGINE_OPTIONS for `uri`.
+
+    Pre-ping replaces connections the server closed while idle, and recycle
+    retires them before MySQL's wait_timeout would. In-memory SQLite uses a
+    single shared connection and takes no pool sizing.
+    """
+    options = {'pool_pre_ping': True, 'pool_recycle': pool_recycle}
+    if not (uri.startswith('sqlite') and ':memory:' in uri):
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    return options
+
+class RoutingSession(Session):
+    """Sends safe reads of the public blueprints to the 'replica' bind.
+
+    Everything else uses the primary: writes, flushes, CLI commands and
+    background threads, other blueprints, and any request from a client
+    that wrote within READ_YOUR_WRITES_SECONDS, so users see their own
+    changes despite replication lag. Without a replica bind this is the
+    stock session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _reads_from_replica():
+            replica = self._db.engines.get('replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _reads_from_replica():
+    if not has_request_context():
+        return False
+    if request.method not in SAFE_METHODS or request.blueprint not in REPLICA_BLUEPRINTS:
+        return False
+    return not pinned_to_primary()
+
+def pinned_to_primary():
+    """True while this client's reads must see its own recent writes."""
+    return session.get('read_primary_until', 0) > time.time()
+
+def init_app(app):
+    app.config.setdefault('READ_YOUR_WRITES_SECONDS', 5)
+    if 'replica' not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+
+    @app.after_request
+    def stick_to_primary(response):
+        # The client's next reads go to the primary until the replica has
+        # most likely caught up with this write
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            session['read_primary_until'] = time.time() + current_app.config['READ_YOUR_WRITES_SECONDS']
+        return response
+
+def pool_status():
+    """Pool occupancy and a ping per bind, for the admin readout."""
+    from extensions import db
+
+    status = {}
+    for key, engine in db.engines.items():
+        pool = engine.pool
+        entry = {'url': engine.url.render_as_string(hide_password=True), 'pool': type(pool).__name__}
+        # Only QueuePool-style pools keep counts
+        for stat in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if hasattr(pool, stat):
+                entry[stat] = getattr(pool, stat)()
+        started = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+            entry['healthy'] = True
+        except Exception as error:
+            entry['healthy'] = False
+            entry['error'] = str(error)
+        entry['ping_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        status[key or 'primary'] = entry
+    return status
@@ -2,14 +2,20 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_cors import CORS
+from cache import ResponseCache
+from db_routing import RoutingSession
+from instrumentation import Instrumentation
+from principals import PrincipalCache
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 cors = CORS()
+response_cache = ResponseCache()
+instrumentation = Instrumentation()
+principal_cache = PrincipalCache()
 
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    return principal_cache.load(int(user_id))
 
@@ -0,0 +1,53 @@
+from flask import current_app
+from cache import LRUBackend
+
+class FragmentCache:
+    """Per-process cache of list items already encoded as JSON.
+
+    A fragment is keyed by the result row it was serialized from, i.e. by
+    every value the item shows, so an edit, a new comment count or a
+    renamed author or category yields a different row and the stale
+    fragment is simply never looked up again; no invalidation is needed.
+    List views look up one row per item and splice the bytes into the page
+    envelope, leaving dict building and encoding to misses.
+    ARTICLE_FRAGMENT_CACHE_SIZE of 0 turns it off.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ARTICLE_FRAGMENT_CACHE_SIZE', 10000)
+        size = app.config['ARTICLE_FRAGMENT_CACHE_SIZE']
+        app.extensions['fragment_cache'] = LRUBackend(size, ttl=0) if size else None
+
+    @property
+    def enabled(self):
+        # Debug mode indents JSON, which fragments cannot be spliced into
+        return current_app.extensions['fragment_cache'] is not None and not current_app.debug
+
+    def list_response(self, envelope, field, rows, serialize):
+        """JSON response of `envelope` with `field` set to the serialized `rows`.
+
+        `rows` must be result rows holding only plain column values, all of
+        which `serialize` may use. The body is byte for byte what jsonify
+        would produce.
+        """
+        backend = current_app.extensions['fragment_cache']
+        json = current_app.json
+        fragments = []
+        for row in rows:
+            fragment = backend.get(row)
+            if fragment is None:
+                fragment = json.dumps(serialize(row), separators=(',', ':')).encode('utf-8')
+                backend.set(row, fragment)
+            fragments.append(fragment)
+
+        # Encode the envelope around a marker, then swap in the fragments
+        marker = json.dumps('\0fragments')
+        head, tail = json.dumps({**envelope, field: '\0fragments'}, separators=(',', ':')).split(marker, 1)
+        body = b''.join([head.encode('utf-8'), b'[', b','.join(fragments), b']', tail.encode('utf-8'), b'\n'])
+        return current_app.response_class(body, mimetype=json.mimetype)
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,96 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import make_response, request
+from flask_login import current_user
+from sqlalchemy import func, select
+from extensions import db
+
+def viewer_role():
+    # Anything a non-admin can see is the same for every non-admin
+    return 'admin' if current_user.is_authenticated and current_user.is_admin else 'public'
+
+def table_version(model, *criteria):
+    """Row count and newest updated_at for `model` rows matching `criteria`.
+
+    The count catches deletes, which never move max(updated_at).
+    """
+    return db.session.execute(
+        select(func.count(model.id), func.max(model.updated_at)).where(*criteria)
+    ).one()
+
+def newest(*timestamps):
+    return max((t for t in timestamps if t is not None), default=None)
+
+def _make_etag(version):
+    # The same data renders differently per endpoint, query string and role
+    key = repr((request.endpoint, sorted(request.args.items(multi=True)), viewer_role(), version))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def _not_modified(etag, last_modified):
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 7232)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+def conditional(validator):
+    """Answer conditional GETs without running the view.
+
+    `validator(**view_args)` returns `(version, last_modified)` for the data
+    behind the response, where `version` is anything with a stable repr that
+    changes whenever the response would, and `last_modified` is a naive UTC
+    datetime or None. Returning None skips validation, e.g. for a 404.
+
+    A matching If-None-Match or If-Modified-Since gets an empty 304, so a
+    revalidation costs the validator query and nothing else.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            state = validator(**kwargs)
+            if state is None:
+                return view(*args, **kwargs)
+
+            version, last_modified = state
+            etag = _make_etag(version)
+            if last_modified is not None:
+                # HTTP dates have one second resolution
+                last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+
+            if _not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Let caches store it but make them check back every time
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
+
+def content_etag(view):
+    """Give 200 responses of `view` an ETag hashed from their body.
+
+    For listings whose version would take a scan of the whole table to
+    compute. A revalidation runs the view, so a matching If-None-Match only
+    saves the transfer; in front of the response cache, hits replay the
+    stored ETag without touching the database. Streamed bodies get none.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response
+        response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+    return wrapper
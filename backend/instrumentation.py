@@ -0,0 +1,176 @@
+import bisect
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+# Upper bounds in seconds (Prometheus `le`), plus +Inf
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Statements kept per request for the slow request log
+MAX_LOGGED_STATEMENTS = 50
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label tuple."""
+
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+            for labels, data in series:
+                base = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(label_names, labels))
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), data['counts']):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_sum{{{base}}} {data["sum"]:.6f}')
+                lines.append(f'{self.name}_count{{{base}}} {cumulative}')
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Adds the time spent encoding JSON to the current request's timings."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            timings = g.get('_timings') if has_request_context() else None
+            if timings is not None:
+                timings['serialize'] += time.perf_counter() - started
+
+class Instrumentation:
+    """Per-request timings: SQL count and time, JSON time and total time.
+
+    Each response carries them in a Server-Timing header. Requests over
+    SLOW_REQUEST_MS and statements over SLOW_QUERY_MS are logged with their
+    SQL, and every request feeds per-route histograms that the admin
+    metrics endpoint renders for Prometheus. Histograms are per process.
+    """
+
+    LABELS = ('method', 'route')
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from extensions import db
+
+        app.config.setdefault('INSTRUMENTATION_ENABLED', True)
+        app.config.setdefault('SLOW_REQUEST_MS', 500)
+        app.config.setdefault('SLOW_QUERY_MS', 100)
+        if not app.config['INSTRUMENTATION_ENABLED']:
+            return
+
+        app.extensions['instrumentation'] = {
+            'requests': Histogram('blog_request_duration_seconds', 'Time to build the response.', DURATION_BUCKETS),
+            'db': Histogram('blog_request_db_seconds', 'Time spent in SQL per request.', DURATION_BUCKETS),
+            'statements': Histogram('blog_request_sql_statements', 'SQL statements per request.', STATEMENT_BUCKETS),
+            'responses': {},
+            'lock': threading.Lock(),
+        }
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+        with app.app_context():
+            for engine in db.engines.values():
+                self.watch(engine)
+
+    def watch(self, engine):
+        """Count and time the statements `engine` runs during requests."""
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+
+    def _start(self):
+        g._timings = {'started': time.perf_counter(), 'statements': 0, 'db': 0.0, 'serialize': 0.0, 'sql': []}
+
+    def _finish(self, response):
+        timings = g.pop('_timings', None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings['started']
+
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={timings["db"] * 1000:.2f};desc="{timings["statements"]} queries"',
+            f'serialize;dur={timings["serialize"] * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+        # The rule, not the path, so /api/articles/1 and /2 share a series
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        labels = (request.method, route)
+        state = current_app.extensions['instrumentation']
+        state['requests'].observe(labels, total)
+        state['db'].observe(labels, timings['db'])
+        state['statements'].observe(labels, timings['statements'])
+        with state['lock']:
+            key = labels + (str(response.status_code),)
+            state['responses'][key] = state['responses'].get(key, 0) + 1
+
+        if total * 1000 >= current_app.config['SLOW_REQUEST_MS']:
+            statements = '\n'.join(f'  {dur * 1000:.1f}ms {sql}' for sql, dur in timings['sql'])
+            current_app.logger.warning(
+                'Slow request %s %s: %.1fms, %d queries in %.1fms\n%s',
+                request.method, request.full_path.rstrip('?'), total * 1000,
+                timings['statements'], timings['db'] * 1000, statements
+            )
+        return response
+
+    def render(self):
+        """The current metrics in Prometheus text format."""
+        state = current_app.extensions['instrumentation']
+        lines = ['# HELP blog_requests_total Responses by route and status.', '# TYPE blog_requests_total counter']
+        with state['lock']:
+            for (method, route, status), count in sorted(state['responses'].items()):
+                lines.append(f'blog_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+        for name in ('requests', 'db', 'statements'):
+            lines.extend(state[name].render(self.LABELS))
+        return '\n'.join(lines) + '\n'
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_started'].pop()
+    if not has_request_context():
+        return
+
+    timings = g.get('_timings')
+    if timings is not None:
+        timings['statements'] += 1
+        timings['db'] += duration
+        if len(timings['sql']) < MAX_LOGGED_STATEMENTS:
+            timings['sql'].append((statement, duration))
+
+    if duration * 1000 >= current_app.config['SLOW_QUERY_MS']:
+        current_app.logger.warning('Slow query (%.1fms) in %s %s: %s',
+                                   duration * 1000, request.method, request.path, statement)
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
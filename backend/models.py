@@ -1,7 +1,8 @@
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy.dialects import mysql
 from extensions import db
+from passwords import password_hasher
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,47 +10,135 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), index=True, unique=True)
     password_hash = db.Column(db.String(256))
     is_admin = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     articles = db.relationship('Article', backref='author', lazy='dynamic')
     comments = db.relationship('Comment', backref='author', lazy='dynamic')
 
+    # Both run in the password hasher's process pool, see passwords.py
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), unique=True)
     description = db.Column(db.String(256))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     articles = db.relationship('Article', backref='category', lazy='dynamic')
 
+class CategoryArticleCount(db.Model):
+    # Maintained by the article write routes; rebuild with `flask repair-counters`
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class StatusCount(db.Model):
+    # Articles and comments per status, maintained by the write routes;
+    # rebuild with `flask repair-counters`
+    kind = db.Column(db.String(20), primary_key=True) # article, comment
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyCount(db.Model):
+    # Rows created per UTC day, maintained like StatusCount. Day first, so
+    # the dashboard's last-N-days read is a range scan
+    day = db.Column(db.Date, primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True) # article, comment, user
+    count = db.Column(db.Integer, nullable=False, default=0)
+
 class Article(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(140))
     summary = db.Column(db.String(500))
     content = db.Column(db.Text)
+    # Rendered from content on save, see rendering.py
+    content_html = db.Column(db.Text)
+    toc = db.Column(db.Text)
+    content_hash = db.Column(db.String(64))
+    # Approved comments, maintained by the comment write routes
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Both maintained in batches by view_counter.py
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    trending_score = db.Column(db.Float)
     created_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, index=True, default=datetime.utcnow, onupdate=datetime.utcnow)
     status = db.Column(db.String(20), default='published') # published, draft, private
     
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     
     comments = db.relationship('Comment', backref='article', lazy='dynamic')
 
+    __table_args__ = (
+        # Listing: WHERE status = ? ORDER BY created_at DESC (, id DESC)
+        db.Index('ix_article_status_created_at', 'status', 'created_at'),
+        # Validators: COUNT(*), MAX(updated_at), SUM(comment_count) WHERE status = ?
+        db.Index('ix_article_status_updated_at', 'status', 'updated_at', 'comment_count'),
+        # Trending: WHERE status = ? ORDER BY trending_score DESC
+        db.Index('ix_article_status_trending_score', 'status', 'trending_score'),
+    )
+
+class ArticleRevision(db.Model):
+    # Saved text of an article, see revisions.py. `data` is zlib-compressed
+    # JSON: the full text for snapshots, line edits against the previous
+    # revision otherwise
+    id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False)
+    number = db.Column(db.Integer, nullable=False) # 1, 2, ... per article
+    snapshot = db.Column(db.Boolean, nullable=False, default=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+
+    __table_args__ = (
+        db.UniqueConstraint('article_id', 'number', name='uq_article_revision_number'),
+    )
+
+class SearchDocument(db.Model):
+    # Full-text index over articles, maintained by search.py
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), primary_key=True)
+    length = db.Column(db.Integer, nullable=False)
+
+class SearchPosting(db.Model):
+    # Terms compare byte for byte: MySQL's default collation would fold
+    # 'résumé' into 'resume' and make the two postings collide
+    term = db.Column(db.String(64).with_variant(mysql.VARCHAR(64, collation='utf8mb4_bin'), 'mysql'),
+                     primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), primary_key=True, index=True)
+    weight = db.Column(db.Float, nullable=False) # field-weighted term frequency
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     status = db.Column(db.String(20), default='pending') # pending, approved, rejected
     
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     article_id = db.Column(db.Integer, db.ForeignKey('article.id'))
 
+    __table_args__ = (
+        # Article page: WHERE article_id = ? AND status = ? ORDER BY created_at DESC
+        db.Index('ix_comment_article_status_created_at', 'article_id', 'status', 'created_at'),
+        # Moderation queue: WHERE status = ? ORDER BY created_at DESC
+        db.Index('ix_comment_status_created_at', 'status', 'created_at'),
+    )
+
+class ImportIdMap(db.Model):
+    # Ids a content import gave each source row, see transfer.py; lets an
+    # interrupted import resume and later records find their references
+    job = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(20), primary_key=True) # user, category, article, comment
+    source_id = db.Column(db.Integer, primary_key=True)
+    target_id = db.Column(db.Integer, nullable=False)
+
 class Setting(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(64), unique=True, index=True)
     value = db.Column(db.String(256))
     description = db.Column(db.String(256))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
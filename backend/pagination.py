@@ -0,0 +1,52 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+class InvalidCursor(ValueError):
+    pass
+
+def wants_cursor(args):
+    """Cursor mode is opt-in: any request carrying `cursor` or `limit`."""
+    return 'cursor' in args or 'limit' in args
+
+def encode_cursor(created_at, id):
+    raw = json.dumps([created_at.isoformat(), id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+def keyset_page(query, created_col, id_col, cursor=None, limit=DEFAULT_LIMIT):
+    """Return one page of `query` newest first, keyed on (created_at, id).
+
+    The cursor is the key of the last row already seen, so the next page is a
+    range scan starting right after it: no OFFSET and no COUNT, and page 500
+    costs the same as page 1. Raises InvalidCursor for a malformed cursor.
+    """
+    limit = max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            created_col < created_at,
+            and_(created_col == created_at, id_col < last_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
@@ -0,0 +1,90 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+class HasherBusy(Exception):
+    """Every hashing slot is taken; the request should be retried later."""
+
+# One pool per size for the whole process; apps share them
+_pools = {}
+_pools_lock = threading.Lock()
+# Hash prefix ("method:params") each configured method writes
+_prefixes = {}
+
+def _pool(workers):
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # spawn, not fork: the web process has threads running
+            pool = _pools[workers] = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        return pool
+
+@atexit.register
+def _shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+
+class PasswordHasher:
+    """Password hashing and checking in a bounded process pool.
+
+    Hashes run in PASSWORD_HASH_WORKERS processes (0 runs them inline) so a
+    login burst costs pool CPU, not request threads. At most
+    PASSWORD_HASH_MAX_PENDING hashes may be running or queued; past that,
+    HasherBusy is raised and the app answers 429 at once instead of making
+    readers queue behind it. PASSWORD_HASH_METHOD is any Werkzeug method
+    string and sets the cost; logins rehash passwords stored with another.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        workers = min(4, os.cpu_count() or 1)
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', workers)
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 2 * max(app.config['PASSWORD_HASH_WORKERS'], 1))
+        app.extensions['password_hasher'] = {
+            'slots': threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+        }
+        app.register_error_handler(HasherBusy, _busy)
+
+    def _run(self, fn, *args):
+        if not current_app.extensions['password_hasher']['slots'].acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            workers = current_app.config['PASSWORD_HASH_WORKERS']
+            if not workers:
+                return fn(*args)
+            return _pool(workers).submit(fn, *args).result()
+        finally:
+            current_app.extensions['password_hasher']['slots'].release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if `pwhash` was made with other settings than the current ones."""
+        method = current_app.config['PASSWORD_HASH_METHOD']
+        if method not in _prefixes:
+            # Werkzeug fills in defaults (e.g. pbkdf2 iterations), so compare
+            # against what the configured method actually writes
+            _prefixes[method] = generate_password_hash('', method, salt_length=1).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != _prefixes[method]
+
+def _busy(error):
+    response = jsonify({'error': 'Too many authentication requests, try again shortly'})
+    response.status_code = 429
+    response.headers['Retry-After'] = '1'
+    return response
+
+password_hasher = PasswordHasher()
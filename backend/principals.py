@@ -0,0 +1,128 @@
+import threading
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from cache import LRUBackend
+
+class Principal(UserMixin):
+    """What a request needs to know about its user, without an ORM row.
+
+    Views read id, username, email and is_admin from current_user; anything
+    else (relationships, the password hash) means loading the User.
+    """
+
+    def __init__(self, id, username, email, is_admin):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_admin = bool(is_admin)
+
+class PrincipalCache:
+    """TTL/LRU cache of principals for Flask-Login's user_loader.
+
+    Committed changes to a User through the ORM evict that user here. Other
+    worker processes keep their copy for up to PRINCIPAL_CACHE_TTL seconds,
+    which bounds how long e.g. a revoked admin flag can linger there.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PRINCIPAL_CACHE_MAX_ENTRIES', 4096)
+        app.config.setdefault('PRINCIPAL_CACHE_TTL', 60)
+        app.extensions['principal_cache'] = {
+            'backend': LRUBackend(app.config['PRINCIPAL_CACHE_MAX_ENTRIES'], app.config['PRINCIPAL_CACHE_TTL']),
+            'hits': 0,
+            'misses': 0,
+            'lock': threading.Lock(),
+        }
+        _listen()
+
+    @property
+    def _state(self):
+        return current_app.extensions['principal_cache']
+
+    def load(self, user_id):
+        from models import User
+
+        state = self._state
+        principal = state['backend'].get(user_id)
+        with state['lock']:
+            state['hits' if principal is not None else 'misses'] += 1
+        if principal is not None:
+            return principal
+
+        from extensions import db
+
+        row = db.session.execute(
+            select(User.id, User.username, User.email, User.is_admin).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        principal = Principal(*row)
+        state['backend'].set(user_id, principal)
+        return principal
+
+    def remember(self, user):
+        """Cache `user`, e.g. right after login where the row is at hand."""
+        principal = Principal(user.id, user.username, user.email, user.is_admin)
+        self._state['backend'].set(user.id, principal)
+        return principal
+
+    def invalidate(self, *user_ids):
+        for user_id in user_ids:
+            self._state['backend'].delete(user_id)
+
+    def stats(self):
+        state = self._state
+        with state['lock']:
+            return {'hits': state['hits'], 'misses': state['misses'], 'size': len(state['backend'])}
+
+    def render(self):
+        """Hit and miss counters in Prometheus text format."""
+        stats = self.stats()
+        return '\n'.join([
+            '# HELP blog_principal_cache_hits_total User loads answered from the principal cache.',
+            '# TYPE blog_principal_cache_hits_total counter',
+            f"blog_principal_cache_hits_total {stats['hits']}",
+            '# HELP blog_principal_cache_misses_total User loads that queried the database.',
+            '# TYPE blog_principal_cache_misses_total counter',
+            f"blog_principal_cache_misses_total {stats['misses']}",
+            '# HELP blog_principal_cache_entries Principals currently cached.',
+            '# TYPE blog_principal_cache_entries gauge',
+            f"blog_principal_cache_entries {stats['size']}",
+        ]) + '\n'
+
+_listening = False
+
+def _listen():
+    # Session events are global, so register them once per process
+    global _listening
+    if _listening:
+        return
+    _listening = True
+
+    from models import User
+
+    def changed(mapper, connection, target):
+        session = Session.object_session(target)
+        if session is not None:
+            session.info.setdefault('changed_principals', set()).add(target.id)
+
+    def after_commit(session):
+        user_ids = session.info.pop('changed_principals', None)
+        if user_ids and has_app_context() and 'principal_cache' in current_app.extensions:
+            from extensions import principal_cache
+            principal_cache.invalidate(*user_ids)
+
+    def after_rollback(session):
+        session.info.pop('changed_principals', None)
+
+    event.listen(User, 'after_update', changed)
+    event.listen(User, 'after_delete', changed)
+    event.listen(Session, 'after_commit', after_commit)
+    event.listen(Session, 'after_rollback', after_rollback)
+
@@ -0,0 +1,60 @@
+import hashlib
+import html
+import json
+import markdown
+import nh3
+from markdown.extensions.toc import TocExtension, slugify_unicode
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'sane_lists']
+
+ALLOWED_TAGS = nh3.ALLOWED_TAGS
+ALLOWED_ATTRIBUTES = {
+    **nh3.ALLOWED_ATTRIBUTES,
+    **{f'h{level}': {'id'} for level in range(1, 7)},
+    'a': {'href', 'hreflang', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'code': {'class'},
+}
+
+def content_hash(content):
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+def _flatten_toc(tokens, out):
+    for token in tokens:
+        out.append({
+            'text': html.unescape(token['name']),
+            'depth': token['level'],
+            'slug': token['id']
+        })
+        _flatten_toc(token['children'], out)
+    return out
+
+def render_markdown(content):
+    """Render Markdown to sanitized HTML and a flat heading list.
+
+    Returns (html, toc) where toc is a list of {text, depth, slug} in document
+    order, the same shape ArticleDetail.vue used to build in the browser.
+    Headings keep Unicode in their slugs so Chinese titles get usable anchors.
+    """
+    # Markdown instances carry per-document state, so one per call
+    md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS + [TocExtension(slugify=slugify_unicode)])
+    raw_html = md.convert(content or '')
+    clean_html = nh3.clean(raw_html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+    return clean_html, _flatten_toc(md.toc_tokens, [])
+
+def render_article(article, force=False):
+    """Refresh the cached HTML and TOC on `article` if its content changed.
+
+    Returns True when the article was re-rendered.
+    """
+    digest = content_hash(article.content)
+    if not force and article.content_hash == digest and article.content_html is not None:
+        return False
+
+    article.content_html, toc = render_markdown(article.content)
+    article.toc = json.dumps(toc, ensure_ascii=False)
+    article.content_hash = digest
+    return True
+
+def article_toc(article):
+    return json.loads(article.toc) if article.toc else []
@@ -0,0 +1,143 @@
+import difflib
+import json
+import zlib
+from datetime import datetime
+from sqlalchemy import case, delete, func, select
+from extensions import db
+from models import ArticleRevision
+
+# Every this many revisions is a full snapshot, so rebuilding any revision
+# applies at most SNAPSHOT_INTERVAL - 1 deltas
+SNAPSHOT_INTERVAL = 10
+
+FIELDS = ('title', 'summary', 'content')
+
+def _pack(payload):
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 9)
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+def _lines(text):
+    return (text or '').splitlines(keepends=True)
+
+def make_delta(old, new):
+    """Line edits turning `old` into `new`: [[start, end, lines], ...].
+
+    Each edit replaces old lines [start, end) with `lines`; unchanged runs
+    are not stored at all.
+    """
+    old_lines, new_lines = _lines(old), _lines(new)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [[i1, i2, new_lines[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+def apply_delta(old, edits):
+    lines = _lines(old)
+    # Back to front, so earlier offsets stay valid
+    for start, end, replacement in reversed(edits):
+        lines[start:end] = replacement
+    return ''.join(lines)
+
+def record(article, previous=None, user_id=None):
+    """Add the current text of `article` as its next revision.
+
+    `previous` is the text the article had before this edit, a dict of
+    FIELDS. It doubles as the delta base, since the last revision holds it
+    whenever every edit goes through here; for articles from before
+    revisions were kept it is first recorded as a snapshot of its own.
+    Returns the new revision, or None if the text did not change.
+    Runs inside the caller's transaction.
+    """
+    current = {field: getattr(article, field) for field in FIELDS}
+    last, last_snapshot = db.session.execute(
+        select(func.max(ArticleRevision.number),
+               func.max(case((ArticleRevision.snapshot, ArticleRevision.number))))
+        .where(ArticleRevision.article_id == article.id)
+    ).one()
+
+    if last is None and previous is not None:
+        _add(article.id, 1, True, _pack(previous), None)
+        last = last_snapshot = 1
+    if previous is not None and previous == current:
+        return None
+
+    number = (last or 0) + 1
+    full = _pack(current)
+    if previous is None or last_snapshot is None or number - last_snapshot >= SNAPSHOT_INTERVAL:
+        return _add(article.id, number, True, full, user_id)
+
+    delta = _pack({
+        'title': current['title'],
+        'summary': current['summary'],
+        'edits': make_delta(previous['content'], current['content']),
+    })
+    # A rewrite diffs worse than it compresses; store it whole
+    if len(delta) >= len(full) // 2:
+        return _add(article.id, number, True, full, user_id)
+    return _add(article.id, number, False, delta, user_id)
+
+def _add(article_id, number, snapshot, data, user_id):
+    revision = ArticleRevision(
+        article_id=article_id, number=number, snapshot=snapshot, data=data,
+        user_id=user_id, created_at=datetime.utcnow()
+    )
+    db.session.add(revision)
+    return revision
+
+def history(article_id):
+    """Revisions of an article, newest first, without their text."""
+    return db.session.execute(
+        select(ArticleRevision.number, ArticleRevision.created_at, ArticleRevision.user_id,
+               ArticleRevision.snapshot, func.length(ArticleRevision.data).label('size'))
+        .where(ArticleRevision.article_id == article_id)
+        .order_by(ArticleRevision.number.desc())
+    ).all()
+
+def load(article_id, number):
+    """Text of revision `number` as a dict of FIELDS, or None if it does not exist.
+
+    One query reads the nearest snapshot at or before `number` and the
+    deltas after it.
+    """
+    base = (
+        select(func.max(ArticleRevision.number))
+        .where(ArticleRevision.article_id == article_id, ArticleRevision.number <= number,
+               ArticleRevision.snapshot)
+        .scalar_subquery()
+    )
+    rows = db.session.execute(
+        select(ArticleRevision.number, ArticleRevision.snapshot, ArticleRevision.data)
+        .where(ArticleRevision.article_id == article_id,
+               ArticleRevision.number >= base, ArticleRevision.number <= number)
+        .order_by(ArticleRevision.number)
+    ).all()
+    if not rows or rows[-1].number != number:
+        return None
+
+    text = _unpack(rows[0].data)
+    for row in rows[1:]:
+        payload = _unpack(row.data)
+        text = {
+            'title': payload['title'],
+            'summary': payload['summary'],
+            'content': apply_delta(text['content'], payload['edits']),
+        }
+    return text
+
+def diff(old, new, old_label, new_label):
+    """Unified diff of the content of two revisions, and changed title/summary."""
+    changes = {
+        field: {'from': old[field], 'to': new[field]}
+        for field in ('title', 'summary') if old[field] != new[field]
+    }
+    def lines(text):
+        # A last line without a newline would run into the next diff line
+        return [line if line.endswith('\n') else line + '\n' for line in _lines(text)]
+
+    changes['content'] = ''.join(
+        difflib.unified_diff(lines(old['content']), lines(new['content']), old_label, new_label)
+    )
+    return changes
+
+def remove_article(article_id):
+    db.session.execute(delete(ArticleRevision).where(ArticleRevision.article_id == article_id))
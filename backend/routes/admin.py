@@ -0,0 +1,78 @@
+from flask import Blueprint, current_app, jsonify, request, stream_with_context
+from flask_login import login_required, current_user
+from extensions import instrumentation, principal_cache
+from db_routing import pool_status
+from counters import daily_counts, status_counts
+import transfer
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+# Days of new articles, comments and users on the dashboard
+STATS_DAYS = 90
+
+@admin_bp.route('/metrics', methods=['GET'])
+@login_required
+def get_metrics():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+    if 'instrumentation' not in current_app.extensions:
+        return jsonify({'error': 'Instrumentation is disabled'}), 404
+
+    body = instrumentation.render() + principal_cache.render()
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@admin_bp.route('/db', methods=['GET'])
+@login_required
+def get_db_status():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return jsonify(pool_status())
+
+@admin_bp.route('/stats', methods=['GET'])
+@login_required
+def get_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    # Read from the rollups in counters.py, not the article and comment tables
+    counts = status_counts()
+    return jsonify({
+        'articles': counts['article'],
+        'comments': counts['comment'],
+        'pending_comments': counts['comment'].get('pending', 0),
+        'daily': [
+            {'date': day['date'], 'articles': day['article'], 'comments': day['comment'], 'users': day['user']}
+            for day in daily_counts(STATS_DAYS)
+        ]
+    })
+
+@admin_bp.route('/export', methods=['GET'])
+@login_required
+def export_content():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    # Streamed from server-side cursors, see transfer.export_lines
+    return current_app.response_class(
+        stream_with_context(transfer.export_lines()),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=blog-export.ndjson'}
+    )
+
+@admin_bp.route('/import', methods=['POST'])
+@login_required
+def import_content():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    # Read the body line by line rather than whole
+    lines = (line.decode('utf-8') for line in request.stream)
+    try:
+        report = transfer.import_lines(lines, dry_run=dry_run)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    except transfer.ImportInterrupted as exc:
+        return jsonify({'error': str(exc)}), 500
+    return jsonify(report)
@@ -1,10 +1,75 @@
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from extensions import db
-from models import Article, Category
+from sqlalchemy import func, select
+from extensions import db, response_cache
+from models import Article, Category, User
+from counters import adjust_category_count, count_rows, move_category_count, move_status_count
+from fragments import fragment_cache
+from http_cache import conditional, content_etag, newest, viewer_role
+from pagination import MAX_LIMIT, InvalidCursor, keyset_page, wants_cursor
+import revisions
+import search
+import static_export
+from view_counter import view_counter
+from rendering import article_toc, content_hash, render_article, render_markdown
 
 article_bp = Blueprint('article', __name__, url_prefix='/api/articles')
 
+def _article_list_query():
+    # Only the columns the listing returns, with author and category joined in,
+    # so a page is one SELECT no matter how many rows it holds.
+    return Article.query.with_entities(
+        Article.id,
+        Article.title,
+        Article.summary,
+        Article.created_at,
+        Article.status,
+        Article.comment_count,
+        User.username.label('author'),
+        Category.name.label('category')
+    ).outerjoin(User, Article.user_id == User.id) \
+     .outerjoin(Category, Article.category_id == Category.id)
+
+def _listing_status():
+    status = request.args.get('status')
+    if status:
+        return status
+    if not current_user.is_authenticated or not current_user.is_admin:
+        # Public only sees published
+        return 'published'
+    return None
+
+def _article_version(id):
+    row = db.session.execute(
+        select(Article.status, Article.updated_at, Category.updated_at)
+        .outerjoin(Category, Article.category_id == Category.id)
+        .where(Article.id == id)
+    ).first()
+    if row is None:
+        return None
+    if row.status != 'published' and viewer_role() != 'admin':
+        # The view answers 403; a revalidation must not get a 304 instead
+        return None
+    return tuple(row), newest(*row[1:])
+
+def _article_list_response(envelope, rows):
+    if fragment_cache.enabled:
+        return fragment_cache.list_response(envelope, 'articles', rows, _serialize_article_row)
+    return jsonify({**envelope, 'articles': [_serialize_article_row(row) for row in rows]})
+
+def _serialize_article_row(row):
+    return {
+        'id': row.id,
+        'title': row.title,
+        'summary': row.summary,
+        'created_at': row.created_at.isoformat(),
+        'status': row.status,
+        'author': row.author,
+        'category': row.category,
+        'comment_count': row.comment_count
+    }
+
 @article_bp.route('', methods=['POST'])
 @login_required
 def create_article():
@@ -27,50 +92,122 @@ def create_article():
         summary=summary,
         category_id=category_id,
         status=status,
-        author=current_user
+        user_id=current_user.id
     )
+    render_article(article)
 
     db.session.add(article)
+    adjust_category_count(article.category_id, article.status, 1)
+    db.session.flush()
+    count_rows('article', [(article.created_at, article.status)])
+    revisions.record(article, user_id=current_user.id)
+    search.index_article(article)
     db.session.commit()
+    response_cache.invalidate('articles', 'categories')
+    static_export.notify_write()
 
     return jsonify({'message': 'Article created successfully', 'id': article.id}), 201
 
 @article_bp.route('', methods=['GET'])
+@response_cache.cached('articles')
+@content_etag
 def get_articles():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    status = request.args.get('status')
+    status = _listing_status()
     
-    query = Article.query
+    query = _article_list_query()
     
     if status:
-        query = query.filter_by(status=status)
-    elif not current_user.is_authenticated or not current_user.is_admin:
-        # Public only sees published
-        query = query.filter_by(status='published')
+        query = query.filter(Article.status == status)
 
-    pagination = query.order_by(Article.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    
-    articles = []
-    for article in pagination.items:
-        articles.append({
-            'id': article.id,
-            'title': article.title,
-            'summary': article.summary,
-            'created_at': article.created_at.isoformat(),
-            'status': article.status,
-            'author': article.author.username,
-            'category': article.category.name if article.category else None
-        })
+    if wants_cursor(request.args):
+        try:
+            rows, next_cursor = keyset_page(
+                query, Article.created_at, Article.id,
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', type=int)
+            )
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        return _article_list_response({'next_cursor': next_cursor}, rows)
 
-    return jsonify({
-        'articles': articles,
+    # Flask-SQLAlchemy only caps per_page when told to; the admin list asks for 100
+    pagination = query.order_by(Article.created_at.desc()) \
+        .paginate(page=page, per_page=per_page, max_per_page=MAX_LIMIT, error_out=False)
+
+    return _article_list_response({
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
+    }, pagination.items)
+
+@article_bp.route('/search', methods=['GET'])
+@response_cache.cached('articles')
+@content_etag
+def search_articles():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'Missing search query'}), 400
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = max(1, min(request.args.get('per_page', 10, type=int), 50))
+
+    # Results carry snippets of the body, so only admins may search other statuses
+    status = _listing_status() if viewer_role() == 'admin' else 'published'
+    # One extra hit tells us whether there is another page
+    hits = search.search(q, status=status, limit=per_page + 1, offset=(page - 1) * per_page)
+    has_more = len(hits) > per_page
+    hits = hits[:per_page]
+
+    rows = {}
+    if hits:
+        query = _article_list_query().add_columns(Article.content) \
+            .filter(Article.id.in_([article_id for article_id, _ in hits]))
+        rows = {row.id: row for row in query}
+
+    pattern = search.highlighter(q)
+    results = []
+    for article_id, score in hits:
+        row = rows.get(article_id)
+        if row is None:
+            continue
+        item = _serialize_article_row(row)
+        item['score'] = round(score, 4)
+        item['title_highlight'] = search.highlight(row.title, pattern)
+        item['snippet'] = search.snippet(row.content or row.summary, pattern)
+        results.append(item)
+
+    return jsonify({
+        'results': results,
+        'current_page': page,
+        'has_more': has_more
     })
 
+@article_bp.route('/trending', methods=['GET'])
+@response_cache.cached('trending')
+def get_trending_articles():
+    # View flushes invalidate this namespace, so comment counts and
+    # category names here may lag until the next flush or cache expiry
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    rows = _article_list_query().add_columns(Article.view_count, Article.trending_score) \
+        .filter(Article.status == 'published', Article.trending_score.isnot(None)) \
+        .order_by(Article.trending_score.desc(), Article.id.desc()) \
+        .limit(limit).all()
+
+    now = datetime.utcnow()
+    articles = []
+    for row in rows:
+        item = _serialize_article_row(row)
+        item['views'] = row.view_count
+        item['trending_score'] = round(view_counter.decayed(row.trending_score, now), 2)
+        articles.append(item)
+    return jsonify({'articles': articles})
+
 @article_bp.route('/<int:id>', methods=['GET'])
+@view_counter.counted
+@response_cache.cached(lambda id: f'article:{id}')
+@conditional(_article_version)
 def get_article(id):
     article = Article.query.get_or_404(id)
     
@@ -78,17 +215,30 @@ def get_article(id):
         if not current_user.is_authenticated or not current_user.is_admin:
             return jsonify({'error': 'Unauthorized'}), 403
 
-    return jsonify({
+    result = {
         'id': article.id,
         'title': article.title,
-        'content': article.content,
         'summary': article.summary,
         'created_at': article.created_at.isoformat(),
+        'updated_at': article.updated_at.isoformat() if article.updated_at else None,
         'status': article.status,
         'author': article.author.username,
         'category': article.category.name if article.category else None,
         'category_id': article.category_id
-    })
+    }
+
+    # ?format=html returns the server-rendered body instead of raw Markdown
+    if request.args.get('format') == 'html':
+        if article.content_html is None or article.content_hash != content_hash(article.content):
+            # Not backfilled yet: render for this response only
+            result['html'], result['toc'] = render_markdown(article.content)
+        else:
+            result['html'] = article.content_html
+            result['toc'] = article_toc(article)
+    else:
+        result['content'] = article.content
+
+    return jsonify(result)
 
 @article_bp.route('/<int:id>', methods=['PUT'])
 @login_required
@@ -98,14 +248,24 @@ def update_article(id):
 
     article = Article.query.get_or_404(id)
     data = request.get_json()
+    before = (article.category_id, article.status)
+    text_before = (article.title, article.summary, article.content)
     
     article.title = data.get('title', article.title)
     article.content = data.get('content', article.content)
     article.summary = data.get('summary', article.summary)
     article.category_id = data.get('category_id', article.category_id)
     article.status = data.get('status', article.status)
+    render_article(article)
+    move_category_count(before, (article.category_id, article.status))
+    move_status_count('article', before[1], article.status)
+    if (article.title, article.summary, article.content) != text_before:
+        revisions.record(article, dict(zip(revisions.FIELDS, text_before)), current_user.id)
+        search.index_article(article)
 
     db.session.commit()
+    response_cache.invalidate('articles', f'article:{id}', 'categories', 'trending')
+    static_export.notify_write()
     return jsonify({'message': 'Article updated successfully'})
 
 @article_bp.route('/<int:id>', methods=['DELETE'])
@@ -115,6 +275,89 @@ def delete_article(id):
         return jsonify({'error': 'Unauthorized'}), 403
 
     article = Article.query.get_or_404(id)
+    adjust_category_count(article.category_id, article.status, -1)
+    count_rows('article', [(article.created_at, article.status)], -1)
+    search.remove_article(article.id)
+    revisions.remove_article(article.id)
     db.session.delete(article)
     db.session.commit()
+    response_cache.invalidate('articles', f'article:{id}', 'categories', 'trending')
+    static_export.notify_write()
     return jsonify({'message': 'Article deleted successfully'})
+
+@article_bp.route('/<int:id>/revisions', methods=['GET'])
+@login_required
+def get_revisions(id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    Article.query.get_or_404(id)
+    rows = revisions.history(id)
+    authors = dict(db.session.execute(
+        select(User.id, User.username).where(User.id.in_({row.user_id for row in rows}))
+    ).all())
+    return jsonify([{
+        'number': row.number,
+        'created_at': row.created_at.isoformat(),
+        'author': authors.get(row.user_id),
+        'snapshot': row.snapshot,
+        'size': row.size
+    } for row in rows])
+
+@article_bp.route('/<int:id>/revisions/<int:number>', methods=['GET'])
+@login_required
+def get_revision(id, number):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    text = revisions.load(id, number)
+    if text is None:
+        return jsonify({'error': 'Revision not found'}), 404
+    return jsonify({'number': number, **text})
+
+@article_bp.route('/<int:id>/revisions/diff', methods=['GET'])
+@login_required
+def diff_revisions(id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    old_number = request.args.get('from', type=int)
+    new_number = request.args.get('to', type=int)
+    if old_number is None or new_number is None:
+        return jsonify({'error': 'Missing from or to'}), 400
+
+    old, new = revisions.load(id, old_number), revisions.load(id, new_number)
+    if old is None or new is None:
+        return jsonify({'error': 'Revision not found'}), 404
+    return jsonify({
+        'from': old_number,
+        'to': new_number,
+        **revisions.diff(old, new, f'revision {old_number}', f'revision {new_number}')
+    })
+
+@article_bp.route('/<int:id>/revisions/<int:number>/restore', methods=['POST'])
+@login_required
+def restore_revision(id, number):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    article = Article.query.get_or_404(id)
+    text = revisions.load(id, number)
+    if text is None:
+        return jsonify({'error': 'Revision not found'}), 404
+
+    # Restoring is an edit like any other and becomes the newest revision
+    text_before = {field: getattr(article, field) for field in revisions.FIELDS}
+    for field, value in text.items():
+        setattr(article, field, value)
+    render_article(article)
+    revision = revisions.record(article, text_before, current_user.id)
+    search.index_article(article)
+
+    db.session.commit()
+    response_cache.invalidate('articles', f'article:{id}', 'trending')
+    static_export.notify_write()
+    return jsonify({
+        'message': 'Revision restored successfully',
+        'revision': revision.number if revision is not None else None
+    })
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
-from extensions import db
+from extensions import db, principal_cache
 from models import User
+from passwords import password_hasher
+from counters import count_rows
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -29,6 +31,7 @@ def register():
         user.is_admin = True
 
     db.session.add(user)
+    count_rows('user', [(None, None)])
     db.session.commit()
 
     return jsonify({'message': 'User registered successfully'}), 201
@@ -44,7 +47,14 @@ def login():
     if user is None or not user.check_password(password):
         return jsonify({'error': 'Invalid username or password'}), 401
 
+    if password_hasher.needs_rehash(user.password_hash):
+        # Stored with an older method or cost; upgrade while we have the password
+        user.set_password(password)
+        db.session.commit()
+
     login_user(user)
+    # The next requests of this session then load no user row
+    principal_cache.remember(user)
     return jsonify({
         'message': 'Logged in successfully',
         'user': {
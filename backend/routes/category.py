@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from extensions import db
-from models import Category
+from sqlalchemy import func, select
+from extensions import db, response_cache
+from models import Article, Category, CategoryArticleCount
+from counters import category_counts
+from http_cache import conditional
 
 category_bp = Blueprint('category', __name__, url_prefix='/api/categories')
 
@@ -24,20 +27,44 @@ def create_category():
     category = Category(name=name, description=description)
     db.session.add(category)
     db.session.commit()
+    response_cache.invalidate('categories')
 
     return jsonify({'message': 'Category created successfully', 'id': category.id}), 201
 
+def _categories_version():
+    # Article writes move the counts, so they are part of the version too
+    row = db.session.execute(
+        select(
+            func.count(Category.id),
+            func.max(Category.updated_at),
+            select(func.sum(CategoryArticleCount.count)).scalar_subquery(),
+            select(func.max(Article.updated_at)).scalar_subquery()
+        )
+    ).one()
+    # ETag only: deleting a category never moves max(updated_at)
+    return tuple(row), None
+
 @category_bp.route('', methods=['GET'])
+@response_cache.cached('categories')
+@conditional(_categories_version)
 def get_categories():
+    is_admin = current_user.is_authenticated and current_user.is_admin
     categories = Category.query.all()
+    # Public only counts published articles; admins get the per-status split
+    counts = category_counts() if is_admin else category_counts(status='published')
+
     result = []
     for category in categories:
-        result.append({
+        by_status = counts.get(category.id, {})
+        item = {
             'id': category.id,
             'name': category.name,
             'description': category.description,
-            'article_count': category.articles.count()
-        })
+            'article_count': sum(by_status.values())
+        }
+        if is_admin:
+            item['article_counts'] = by_status
+        result.append(item)
     return jsonify(result)
 
 @category_bp.route('/<int:id>', methods=['PUT'])
@@ -50,13 +77,22 @@ def update_category(id):
     data = request.get_json()
     
     name = data.get('name')
+    renamed = False
     if name and name != category.name:
         if Category.query.filter_by(name=name).first():
             return jsonify({'error': 'Category name already exists'}), 400
         category.name = name
+        renamed = True
         
     category.description = data.get('description', category.description)
     db.session.commit()
+
+    stale = ['categories']
+    if renamed:
+        # Listings and the detail of every article in it show the name
+        article_ids = db.session.scalars(select(Article.id).where(Article.category_id == id))
+        stale += ['articles'] + [f'article:{article_id}' for article_id in article_ids]
+    response_cache.invalidate(*stale)
     return jsonify({'message': 'Category updated successfully'})
 
 @category_bp.route('/<int:id>', methods=['DELETE'])
@@ -75,6 +111,8 @@ def delete_category(id):
     if category.articles.count() > 0:
         return jsonify({'error': 'Cannot delete category with articles'}), 400
 
+    CategoryArticleCount.query.filter_by(category_id=id).delete()
     db.session.delete(category)
     db.session.commit()
+    response_cache.invalidate('categories')
     return jsonify({'message': 'Category deleted successfully'})
@@ -1,10 +1,48 @@
-from flask import Blueprint, request, jsonify
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, request, jsonify, stream_with_context
 from flask_login import login_required, current_user
-from extensions import db
-from models import Comment, Article
+from sqlalchemy import delete, select, update
+from extensions import db, response_cache
+from models import Comment, Article, User
+from http_cache import content_etag
+from settings_store import settings_store
+from comment_queue import comment_ingestor
+from counters import (adjust_comment_count, adjust_comment_counts, adjust_status_counts, count_rows,
+                      move_comment_count, move_status_count)
+from pagination import InvalidCursor, keyset_page, wants_cursor
 
 comment_bp = Blueprint('comment', __name__, url_prefix='/api/comments')
 
+# Rows per transaction for bulk moderation
+BULK_CHUNK_SIZE = 500
+BULK_ACTIONS = {'approve': 'approved', 'reject': 'rejected', 'pending': 'pending', 'delete': None}
+COMMENT_STATUSES = {'pending', 'approved', 'rejected'}
+# Rows per round trip when streaming the full comment list
+STREAM_BATCH_SIZE = 500
+
+def _serialize_comment_row(row):
+    # A row of _comment_list_query, the author's username joined in
+    return {
+        'id': row.id,
+        'content': row.content,
+        'created_at': row.created_at.isoformat(),
+        'status': row.status,
+        'author': row.author,
+        'article_id': row.article_id
+    }
+
+def _comment_list_query():
+    # Only the listed columns, with the author's username joined in, so a
+    # page is one SELECT instead of one more per comment for its author
+    return Comment.query.with_entities(
+        Comment.id,
+        Comment.content,
+        Comment.created_at,
+        Comment.status,
+        User.username.label('author'),
+        Comment.article_id
+    ).outerjoin(User, Comment.user_id == User.id)
+
 @comment_bp.route('', methods=['POST'])
 @login_required
 def create_comment():
@@ -19,12 +57,21 @@ def create_comment():
     if not article:
         return jsonify({'error': 'Article not found'}), 404
 
-    # Default status: pending if admin approval required (TODO: check settings), else approved
-    # For now, let's say default is pending
+    # Default status: pending if admin approval required, else approved
     status = 'pending'
-    if current_user.is_admin:
+    if current_user.is_admin or settings_store.get('comment_approval', 'true') == 'false':
         status = 'approved'
 
+    if comment_ingestor.enabled:
+        pending_id = comment_ingestor.submit(
+            content=content,
+            article_id=article.id,
+            user_id=current_user.id,
+            author=current_user.username,
+            status=status
+        )
+        return jsonify({'message': 'Comment queued', 'pending_id': pending_id, 'status': status}), 202
+
     comment = Comment(
         content=content,
         article_id=article_id,
@@ -33,12 +80,22 @@ def create_comment():
     )
 
     db.session.add(comment)
+    adjust_comment_count(article.id, 1 if status == 'approved' else 0)
+    count_rows('comment', [(None, status)])
     db.session.commit()
+    _invalidate_comments(comment.article_id, listing=status == 'approved')
 
     return jsonify({'message': 'Comment submitted successfully', 'id': comment.id, 'status': status}), 201
 
-@comment_bp.route('', methods=['GET'])
-def get_comments():
+def _invalidate_comments(article_id, listing=False):
+    # Comment lists are cached per article plus one namespace for the rest
+    namespaces = [f'comments:{article_id}', 'comments:all']
+    if listing:
+        # The article listing shows approved comment counts
+        namespaces.append('articles')
+    response_cache.invalidate(*namespaces)
+
+def _comment_filters():
     # Admin sees all, User sees approved or own?
     # Usually public endpoint for article comments, admin endpoint for all.
     # Let's support filtering by article_id and status.
@@ -46,31 +103,84 @@ def get_comments():
     article_id = request.args.get('article_id')
     status = request.args.get('status')
     
-    query = Comment.query
+    criteria = []
 
     if article_id:
-        query = query.filter_by(article_id=article_id)
+        criteria.append(Comment.article_id == article_id)
     
     if status:
-        query = query.filter_by(status=status)
+        criteria.append(Comment.status == status)
     elif not current_user.is_authenticated or not current_user.is_admin:
         # Public only sees approved
-        query = query.filter_by(status='approved')
+        criteria.append(Comment.status == 'approved')
+    return criteria
+
+@comment_bp.route('', methods=['GET'])
+@response_cache.cached(lambda: f"comments:{request.args.get('article_id') or 'all'}")
+@content_etag
+def get_comments():
+    query = _comment_list_query().filter(*_comment_filters())
+
+    if wants_cursor(request.args):
+        try:
+            comments, next_cursor = keyset_page(
+                query, Comment.created_at, Comment.id,
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', type=int)
+            )
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        return jsonify({
+            'comments': [_serialize_comment_row(row) for row in comments],
+            'next_cursor': next_cursor
+        })
+
+    if not request.args.get('article_id'):
+        # Every comment on the site: stream it rather than hold it all
+        return _stream_comments(_comment_filters())
 
     comments = query.order_by(Comment.created_at.desc()).all()
     
-    result = []
-    for comment in comments:
-        result.append({
-            'id': comment.id,
-            'content': comment.content,
-            'created_at': comment.created_at.isoformat(),
-            'status': comment.status,
-            'author': comment.author.username,
-            'article_id': comment.article_id
-        })
+    result = [_serialize_comment_row(row) for row in comments]
     return jsonify(result)
 
+def _stream_comments(criteria):
+    """The comment list as a JSON response encoded batch by batch.
+
+    Rows come from a server-side cursor STREAM_BATCH_SIZE at a time, so
+    memory stays flat however many comments match. The body is the same
+    as jsonify would produce for the whole list.
+    """
+    statement = _comment_list_query().filter(*criteria) \
+        .order_by(Comment.created_at.desc()) \
+        .statement.execution_options(yield_per=STREAM_BATCH_SIZE)
+    json = current_app.json
+
+    def generate():
+        separator = ''
+        yield '['
+        for rows in db.session.execute(statement).partitions():
+            yield separator + ','.join(json.dumps(_serialize_comment_row(row), separators=(',', ':')) for row in rows)
+            separator = ','
+        yield ']\n'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=json.mimetype)
+
+@comment_bp.route('/queued', methods=['GET'])
+@login_required
+def get_queued_comments():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    return jsonify([{
+        'pending_id': item['pending_id'],
+        'content': item['content'],
+        'created_at': item['created_at'].isoformat(),
+        'status': item['status'],
+        'author': item['author'],
+        'article_id': item['article_id']
+    } for item in comment_ingestor.queued()])
+
 @comment_bp.route('/<int:id>/status', methods=['PUT'])
 @login_required
 def update_comment_status(id):
@@ -84,8 +194,12 @@ def update_comment_status(id):
     if status not in ['approved', 'rejected', 'pending']:
         return jsonify({'error': 'Invalid status'}), 400
         
+    before = comment.status
     comment.status = status
+    move_comment_count(comment.article_id, before, status)
+    move_status_count('comment', before, status)
     db.session.commit()
+    _invalidate_comments(comment.article_id, listing='approved' in (before, status))
     return jsonify({'message': 'Comment status updated successfully'})
 
 @comment_bp.route('/<int:id>', methods=['DELETE'])
@@ -95,6 +209,138 @@ def delete_comment(id):
         return jsonify({'error': 'Unauthorized'}), 403
 
     comment = Comment.query.get_or_404(id)
+    move_comment_count(comment.article_id, comment.status, None)
+    count_rows('comment', [(comment.created_at, comment.status)], -1)
     db.session.delete(comment)
     db.session.commit()
+    _invalidate_comments(comment.article_id, listing=comment.status == 'approved')
     return jsonify({'message': 'Comment deleted successfully'})
+
+def _bulk_filter_criteria(spec):
+    """SQL criteria for a bulk `filter`; raises ValueError for values of the wrong kind."""
+    criteria = []
+    if spec.get('status'):
+        if spec['status'] not in COMMENT_STATUSES:
+            raise ValueError(spec['status'])
+        criteria.append(Comment.status == spec['status'])
+    if spec.get('article_id'):
+        if not isinstance(spec['article_id'], int) or isinstance(spec['article_id'], bool):
+            raise ValueError(spec['article_id'])
+        criteria.append(Comment.article_id == spec['article_id'])
+    if spec.get('before'):
+        before = datetime.fromisoformat(spec['before'])
+        if before.tzinfo is not None:
+            # created_at is stored as naive UTC
+            before = before.astimezone(timezone.utc).replace(tzinfo=None)
+        criteria.append(Comment.created_at < before)
+    return criteria
+
+def _bulk_chunks(ids, criteria):
+    """Yield the targeted (id, article_id, status, created_at) rows a chunk at a time.
+
+    Rows are locked until the chunk commits, so the counter deltas match
+    what gets written.
+    """
+    columns = select(Comment.id, Comment.article_id, Comment.status, Comment.created_at).with_for_update()
+    if ids is not None:
+        unique = sorted(set(ids))
+        for start in range(0, len(unique), BULK_CHUNK_SIZE):
+            rows = db.session.execute(columns.where(Comment.id.in_(unique[start:start + BULK_CHUNK_SIZE]))).all()
+            if rows:
+                yield rows
+        return
+
+    # Walk the matches by id; every chunk is its own short transaction
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            columns.where(*criteria, Comment.id > last_id).order_by(Comment.id).limit(BULK_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+def _moderate_chunk(rows, action):
+    """Apply `action` to one chunk of (id, article_id, status, created_at) rows.
+
+    Returns (affected, touched article ids, counts changed).
+    """
+    target = BULK_ACTIONS[action]
+    deltas = {}
+    moved = {}
+    for _, article_id, status, _ in rows:
+        was, now = status == 'approved', target == 'approved'
+        if was != now:
+            deltas[article_id] = deltas.get(article_id, 0) + (1 if now else -1)
+        if target is not None and status != target:
+            moved[status] = moved.get(status, 0) - 1
+            moved[target] = moved.get(target, 0) + 1
+
+    ids = [row[0] for row in rows]
+    if target is None:
+        result = db.session.execute(delete(Comment).where(Comment.id.in_(ids)))
+    else:
+        # Rows already in the target state are left as they are
+        result = db.session.execute(
+            update(Comment)
+            .where(Comment.id.in_(ids), Comment.status != target)
+            .values(status=target, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+    adjust_comment_counts(deltas)
+    if target is None:
+        count_rows('comment', [(created_at, status) for _, _, status, created_at in rows], -1)
+    else:
+        adjust_status_counts('comment', moved)
+    db.session.commit()
+    return result.rowcount, {row[1] for row in rows}, bool(deltas)
+
+@comment_bp.route('/bulk', methods=['POST'])
+@login_required
+def bulk_moderate():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    data = request.get_json() or {}
+    action = data.get('action')
+    if action not in BULK_ACTIONS:
+        return jsonify({'error': 'Invalid action'}), 400
+
+    ids = data.get('ids')
+    spec = data.get('filter')
+    if (ids is None) == (spec is None):
+        return jsonify({'error': 'Provide either ids or filter'}), 400
+    if ids is not None and not (isinstance(ids, list) and all(isinstance(i, int) for i in ids)):
+        return jsonify({'error': 'ids must be a list of integers'}), 400
+
+    criteria = None
+    if spec is not None:
+        try:
+            criteria = _bulk_filter_criteria(spec)
+        except (TypeError, ValueError, AttributeError):
+            return jsonify({'error': 'Invalid filter'}), 400
+        if not criteria:
+            # An empty filter would match every comment
+            return jsonify({'error': 'Filter needs status, article_id or before'}), 400
+
+    matched = affected = 0
+    touched = set()
+    counts_changed = False
+    for rows in _bulk_chunks(ids, criteria):
+        chunk_affected, chunk_articles, chunk_counts = _moderate_chunk(rows, action)
+        matched += len(rows)
+        affected += chunk_affected
+        touched |= chunk_articles
+        counts_changed = counts_changed or chunk_counts
+
+    for article_id in touched:
+        response_cache.invalidate(f'comments:{article_id}')
+    response_cache.invalidate('comments:all', *(['articles'] if counts_changed else []))
+
+    return jsonify({
+        'message': 'Comments moderated successfully',
+        'action': action,
+        'matched': matched,
+        'affected': affected
+    })
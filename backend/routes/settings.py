@@ -1,19 +1,24 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from extensions import db
-from models import Setting
+from extensions import response_cache
+from http_cache import conditional
+from settings_store import settings_store
 
 settings_bp = Blueprint('settings', __name__, url_prefix='/api/settings')
 
+def _settings_version():
+    snapshot = settings_store.snapshot()
+    return snapshot.digest, snapshot.fingerprint[1]
+
 @settings_bp.route('', methods=['GET'])
+@response_cache.cached('settings')
+@conditional(_settings_version)
 def get_settings():
     # Public settings? Or only admin?
     # Usually some settings are public (site title), some private.
     # For simplicity, let's return all for now, or filter if needed.
     # Let's assume all settings stored here are public-safe or we filter keys.
-    settings = Setting.query.all()
-    result = {s.key: s.value for s in settings}
-    return jsonify(result)
+    return jsonify(dict(settings_store.snapshot().values))
 
 @settings_bp.route('', methods=['POST'])
 @login_required
@@ -24,13 +29,6 @@ def update_settings():
     data = request.get_json()
     # Expecting a dict of key-values
     
-    for key, value in data.items():
-        setting = Setting.query.filter_by(key=key).first()
-        if setting:
-            setting.value = str(value)
-        else:
-            setting = Setting(key=key, value=str(value))
-            db.session.add(setting)
-            
-    db.session.commit()
+    settings_store.update(data)
+    response_cache.invalidate('settings')
     return jsonify({'message': 'Settings updated successfully'})
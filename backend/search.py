@@ -0,0 +1,189 @@
+import html
+import math
+import re
+import unicodedata
+from collections import Counter
+from sqlalchemy import case, delete, func, insert, select
+from extensions import db
+from models import Article, SearchDocument, SearchPosting
+
+# Field weights: a hit in the title counts three times a hit in the body
+FIELD_WEIGHTS = (('title', 3.0), ('summary', 2.0), ('content', 1.0))
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+MAX_TERM_LENGTH = 64
+SNIPPET_RADIUS = 60
+
+# Kana, CJK ideographs (incl. extension A and compatibility) and Hangul
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_TOKEN_RE = re.compile(rf'(?P<cjk>[{_CJK}]+)|(?P<word>[^\W_{_CJK}]+)')
+
+def _normalize(text):
+    # NFKC folds full-width Latin and digits, common in Chinese text
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+def tokenize(text):
+    """Split text into index terms.
+
+    Runs of CJK characters have no spaces to split on, so they become
+    overlapping bigrams ("数据库" -> "数据", "据库"); a lone CJK character
+    stays a unigram. Everything else splits on word boundaries.
+    """
+    terms = []
+    for match in _TOKEN_RE.finditer(_normalize(text)):
+        run = match.group('cjk')
+        if run:
+            if len(run) == 1:
+                terms.append(run)
+            else:
+                terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(match.group('word')[:MAX_TERM_LENGTH])
+    return terms
+
+def _weighted_terms(title, summary, content):
+    weights = Counter()
+    length = 0
+    for (_, weight), text in zip(FIELD_WEIGHTS, (title, summary, content)):
+        terms = tokenize(text)
+        length += len(terms)
+        for term in terms:
+            weights[term] += weight
+    return weights, length
+
+def index_article(article):
+    """(Re)index one article inside the caller's transaction."""
+    remove_article(article.id)
+    weights, length = _weighted_terms(article.title, article.summary, article.content)
+    db.session.execute(insert(SearchDocument), [{'article_id': article.id, 'length': length}])
+    if weights:
+        db.session.execute(
+            insert(SearchPosting),
+            [{'term': term, 'article_id': article.id, 'weight': weight} for term, weight in weights.items()]
+        )
+
+def remove_article(article_id):
+    db.session.execute(delete(SearchPosting).where(SearchPosting.article_id == article_id))
+    db.session.execute(delete(SearchDocument).where(SearchDocument.article_id == article_id))
+
+def index_rows(rows):
+    """Index new articles, given as rows with id, title, summary and content.
+
+    One executemany per table, inside the caller's transaction.
+    """
+    documents, postings = [], []
+    for row in rows:
+        weights, length = _weighted_terms(row.title, row.summary, row.content)
+        documents.append({'article_id': row.id, 'length': length})
+        postings.extend({'term': t, 'article_id': row.id, 'weight': w} for t, w in weights.items())
+    if documents:
+        db.session.execute(insert(SearchDocument), documents)
+    if postings:
+        db.session.execute(insert(SearchPosting), postings)
+
+def rebuild(batch_size=500):
+    """Drop and rebuild the whole index. Returns the number of articles indexed."""
+    db.session.execute(delete(SearchPosting))
+    db.session.execute(delete(SearchDocument))
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Article.id, Article.title, Article.summary, Article.content)
+            .where(Article.id > last_id).order_by(Article.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        index_rows(rows)
+        db.session.commit()
+        indexed += len(rows)
+    return indexed
+
+def search(query, status=None, limit=10, offset=0):
+    """Rank articles for `query` with BM25 over the weighted postings.
+
+    Returns [(article_id, score)] best first. `status` restricts matches the
+    same way the article listing does. Only postings for the query terms are
+    touched, so the cost tracks how common the terms are, not table size.
+    """
+    terms = sorted(set(tokenize(query)))
+    if not terms:
+        return []
+
+    total_docs, avg_length = db.session.execute(
+        select(func.count(SearchDocument.article_id), func.avg(SearchDocument.length))
+    ).one()
+    if not total_docs:
+        return []
+    avg_length = float(avg_length) or 1.0
+
+    doc_freq = dict(db.session.execute(
+        select(SearchPosting.term, func.count())
+        .where(SearchPosting.term.in_(terms))
+        .group_by(SearchPosting.term)
+    ).all())
+    if not doc_freq:
+        return []
+
+    idf = {
+        term: math.log((total_docs - df + 0.5) / (df + 0.5) + 1)
+        for term, df in doc_freq.items()
+    }
+    norm = K1 * (1 - B + B * SearchDocument.length / avg_length)
+    score = func.sum(
+        case(idf, value=SearchPosting.term, else_=0.0) * SearchPosting.weight * (K1 + 1)
+        / (SearchPosting.weight + norm)
+    ).label('score')
+
+    stmt = (
+        select(SearchPosting.article_id, score)
+        .join(SearchDocument, SearchDocument.article_id == SearchPosting.article_id)
+        .where(SearchPosting.term.in_(list(doc_freq)))
+        .group_by(SearchPosting.article_id)
+        .order_by(score.desc(), SearchPosting.article_id.desc())
+        .limit(limit).offset(offset)
+    )
+    if status:
+        stmt = stmt.join(Article, Article.id == SearchPosting.article_id).where(Article.status == status)
+    return [(row.article_id, float(row.score)) for row in db.session.execute(stmt)]
+
+def highlighter(query):
+    # Highlight whole query words and whole CJK runs, longest first, falling
+    # back to the bigrams so partial CJK matches still light up.
+    pieces = set(tokenize(query))
+    for match in _TOKEN_RE.finditer(_normalize(query)):
+        pieces.add(match.group(0))
+    pieces = sorted(pieces, key=len, reverse=True)
+    return re.compile('|'.join(re.escape(p) for p in pieces), re.IGNORECASE) if pieces else None
+
+def highlight(text, pattern):
+    """HTML-escape `text` and wrap matches of `pattern` in <mark>."""
+    if not text:
+        return ''
+    if pattern is None:
+        return html.escape(text)
+    out, pos = [], 0
+    for match in pattern.finditer(text):
+        out.append(html.escape(text[pos:match.start()]))
+        out.append(f'<mark>{html.escape(match.group(0))}</mark>')
+        pos = match.end()
+    out.append(html.escape(text[pos:]))
+    return ''.join(out)
+
+def snippet(text, pattern):
+    """A highlighted window of `text` around the first match."""
+    text = ' '.join((text or '').split())
+    match = pattern.search(text) if pattern is not None else None
+    if match is None:
+        window = text[:SNIPPET_RADIUS * 2]
+        return highlight(window, pattern) + ('…' if len(text) > len(window) else '')
+
+    start = max(0, match.start() - SNIPPET_RADIUS)
+    end = min(len(text), match.end() + SNIPPET_RADIUS)
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if end < len(text) else ''
+    return prefix + highlight(text[start:end], pattern) + suffix
@@ -0,0 +1,122 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from types import MappingProxyType
+from flask import current_app
+from sqlalchemy import insert, update
+from extensions import db
+from models import Setting
+from http_cache import table_version
+
+# `values` is read-only; a reload swaps in a whole new Snapshot, so readers
+# never see a half-applied update.
+# `digest` hashes the values themselves, so it is stable across processes.
+Snapshot = namedtuple('Snapshot', 'version values fingerprint digest')
+
+class SettingsStore:
+    """Process-wide snapshot of the Setting table.
+
+    Reads are dictionary lookups. Every SETTINGS_RECHECK_SECONDS one cheap
+    query compares the table's (count, max updated_at) with the snapshot and
+    reloads only if it moved, which is how writes from other workers arrive.
+    Writes in this process reload immediately.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SETTINGS_RECHECK_SECONDS', 5)
+        app.extensions['settings_store'] = {'snapshot': None, 'checked_at': 0.0, 'lock': threading.Lock()}
+
+    @property
+    def _state(self):
+        return current_app.extensions['settings_store']
+
+    def snapshot(self):
+        state = self._state
+        snapshot = state['snapshot']
+        if snapshot is None:
+            return self.reload()
+
+        now = time.monotonic()
+        if now - state['checked_at'] >= current_app.config['SETTINGS_RECHECK_SECONDS']:
+            state['checked_at'] = now
+            if tuple(table_version(Setting)) != snapshot.fingerprint:
+                return self.reload()
+        return snapshot
+
+    def get(self, key, default=None):
+        return self.snapshot().values.get(key, default)
+
+    def reload(self, force=False):
+        state = self._state
+        # Query outside the lock: under the ASGI entry point other requests
+        # on this thread run while we wait on the database, and one of them
+        # blocking on the lock would stall the event loop
+        fingerprint = tuple(table_version(Setting))
+        previous = state['snapshot']
+        if not force and previous is not None and previous.fingerprint == fingerprint:
+            state['checked_at'] = time.monotonic()
+            return previous
+
+        values = {key: value for key, value in db.session.execute(db.select(Setting.key, Setting.value))}
+        digest = hashlib.sha1(repr(sorted(values.items())).encode('utf-8')).hexdigest()
+
+        with state['lock']:
+            previous = state['snapshot']
+            version = previous.version + 1 if previous is not None else 1
+            state['snapshot'] = Snapshot(version, MappingProxyType(values), fingerprint, digest)
+            state['checked_at'] = time.monotonic()
+            return state['snapshot']
+
+    def update(self, values):
+        """Upsert `values`, commit and reload the snapshot.
+
+        One statement where the dialect has an upsert, else an UPDATE and,
+        for keys it missed, an INSERT per key.
+        """
+        if values:
+            now = datetime.utcnow()
+            rows = [{'key': key, 'value': str(value), 'updated_at': now} for key, value in values.items()]
+            stmt = _upsert_statement(rows)
+            if stmt is not None:
+                db.session.execute(stmt)
+            else:
+                _update_then_insert(rows)
+        db.session.commit()
+        # updated_at may not move within the same second, so always reload
+        return self.reload(force=True)
+
+def _upsert_statement(rows):
+    """A single INSERT ... ON CONFLICT/DUPLICATE KEY UPDATE, or None if the dialect has none."""
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(Setting).values(rows)
+        return stmt.on_duplicate_key_update(value=stmt.inserted.value, updated_at=stmt.inserted.updated_at)
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(Setting).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[Setting.key],
+            set_={'value': stmt.excluded.value, 'updated_at': stmt.excluded.updated_at}
+        )
+    return None
+
+def _update_then_insert(rows):
+    for row in rows:
+        result = db.session.execute(
+            update(Setting).where(Setting.key == row['key'])
+            .values(value=row['value'], updated_at=row['updated_at'])
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(Setting).values(**row))
+
+settings_store = SettingsStore()
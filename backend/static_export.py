@@ -0,0 +1,308 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from flask import current_app
+from jinja2 import DictLoader, Environment
+from sqlalchemy import func, select
+from extensions import db
+from models import Article, Category, User
+from counters import category_counts
+from rendering import article_toc, content_hash, render_markdown
+
+# Records what the last run exported, so the next one only redoes changes
+MANIFEST = '.export-manifest.json'
+
+# Listing rows fetched per round trip from the server-side cursor
+LISTING_BATCH_SIZE = 500
+
+_templates = Environment(autoescape=True, loader=DictLoader({
+    'layout.html': """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{% block title %}{{ site_title }}{% endblock %}</title>
+</head>
+<body>
+<header><a href="{{ base }}">{{ site_title }}</a> · <a href="{{ base }}categories/">Categories</a></header>
+<main>{% block main %}{% endblock %}</main>
+</body>
+</html>
+""",
+    'article.html': """{% extends 'layout.html' %}
+{% block title %}{{ article.title }} - {{ site_title }}{% endblock %}
+{% block main %}
+<article>
+<h1>{{ article.title }}</h1>
+<p>{{ article.created_at[:10] }} · {{ article.author }}{% if article.category %} · <a href="{{ base }}categories/{{ article.category_id }}/">{{ article.category }}</a>{% endif %}</p>
+{% if article.toc %}<nav><ul>{% for entry in article.toc %}<li style="margin-left: {{ entry.depth - 1 }}em"><a href="#{{ entry.slug }}">{{ entry.text }}</a></li>{% endfor %}</ul></nav>{% endif %}
+{{ article.html | safe }}
+</article>
+{% endblock %}
+""",
+    'listing.html': """{% extends 'layout.html' %}
+{% block main %}
+{% if heading %}<h1>{{ heading }}</h1>{% endif %}
+{% for article in articles %}
+<section>
+<h2><a href="{{ base }}articles/{{ article.id }}.html">{{ article.title }}</a></h2>
+<p>{{ article.created_at[:10] }} · {{ article.author }} · {{ article.comment_count }} comments</p>
+{% if article.summary %}<p>{{ article.summary }}</p>{% endif %}
+</section>
+{% else %}
+<p>No articles yet.</p>
+{% endfor %}
+<nav>
+{% if page > 1 %}<a href="{{ page_url(page - 1) }}">Newer</a>{% endif %}
+{% if page < pages %}<a href="{{ page_url(page + 1) }}">Older</a>{% endif %}
+</nav>
+{% endblock %}
+""",
+    'categories.html': """{% extends 'layout.html' %}
+{% block main %}
+<h1>Categories</h1>
+<ul>
+{% for category in categories %}<li><a href="{{ base }}categories/{{ category.id }}/">{{ category.name }}</a> ({{ category.article_count }})</li>
+{% endfor %}
+</ul>
+{% endblock %}
+""",
+}))
+
+def _write(out_dir, relative, data):
+    """Write atomically, and not at all if the bytes are unchanged.
+
+    Leaving identical files alone keeps their mtimes, so the web server's
+    Last-Modified and ETag stay valid for readers.
+    """
+    path = os.path.join(out_dir, relative)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp{os.getpid()}'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+def _remove(out_dir, relative):
+    try:
+        os.remove(os.path.join(out_dir, relative))
+    except FileNotFoundError:
+        pass
+
+def _json(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+def _write_article(out_dir, site, article):
+    # Runs in a worker process: render if the cached HTML is stale, then
+    # write the API-shaped JSON and the HTML page
+    if article['html'] is None:
+        article['html'], article['toc'] = render_markdown(article.pop('content'))
+    else:
+        article.pop('content')
+    _write(out_dir, f"api/articles/{article['id']}.json", _json(article))
+    _write(out_dir, f"articles/{article['id']}.html", _templates.get_template('article.html').render(article=article, **site))
+    return article['id']
+
+def _stamp(*timestamps):
+    return max((t for t in timestamps if t is not None), default=datetime.min).isoformat()
+
+def _article_payloads(ids):
+    rows = db.session.execute(
+        select(Article, User.username, Category.name)
+        .outerjoin(User, Article.user_id == User.id)
+        .outerjoin(Category, Article.category_id == Category.id)
+        .where(Article.id.in_(ids))
+    ).all()
+    for article, author, category in rows:
+        fresh = article.content_html is not None and article.content_hash == content_hash(article.content)
+        # Same fields as GET /api/articles/<id>?format=html
+        yield {
+            'id': article.id,
+            'title': article.title,
+            'summary': article.summary,
+            'created_at': article.created_at.isoformat(),
+            'updated_at': article.updated_at.isoformat() if article.updated_at else None,
+            'status': article.status,
+            'author': author,
+            'category': category,
+            'category_id': article.category_id,
+            'html': article.content_html if fresh else None,
+            'toc': article_toc(article) if fresh else None,
+            'content': article.content,
+        }
+
+def _export_listings(out_dir, site, per_page):
+    """Write index, category and categories pages; returns the files written.
+
+    Each listing is read through a server-side cursor and written a page
+    at a time, so memory holds one page however many articles there are.
+    """
+    from routes.article import _article_list_query, _serialize_article_row
+
+    published = _article_list_query().filter(Article.status == 'published') \
+        .order_by(Article.created_at.desc(), Article.id.desc())
+    # Exact totals for the page counts, in one grouped pass
+    totals = dict(db.session.execute(
+        select(Article.category_id, func.count()).where(Article.status == 'published')
+        .group_by(Article.category_id)
+    ).all())
+    counts = category_counts(status='published')
+    categories = [
+        {'id': c.id, 'name': c.name, 'description': c.description,
+         'article_count': sum(counts.get(c.id, {}).values())}
+        for c in Category.query.order_by(Category.id)
+    ]
+
+    files = []
+    def write(relative, data):
+        _write(out_dir, relative, data)
+        files.append(relative)
+
+    def paginate(query, total, json_prefix, html_prefix, heading):
+        pages = max(1, -(-total // per_page))
+        def page_url(n):
+            return f"{site['base']}{html_prefix}" + ('' if n == 1 else f'page/{n}.html')
+        result = db.session.execute(query.statement.execution_options(yield_per=LISTING_BATCH_SIZE))
+        try:
+            for page in range(1, pages + 1):
+                articles = [_serialize_article_row(row) for row in itertools.islice(result, per_page)]
+                # Same shape as GET /api/articles?page=N
+                write(f'{json_prefix}page/{page}.json', _json({
+                    'articles': articles, 'total': total, 'pages': pages, 'current_page': page
+                }))
+                html = _templates.get_template('listing.html').render(articles=articles, page=page, pages=pages,
+                                       page_url=page_url, heading=heading, **site)
+                write(f'{html_prefix}index.html' if page == 1 else f'{html_prefix}page/{page}.html', html)
+        finally:
+            # The cursor is left unread once the pages are full; a server-side
+            # one would otherwise block the connection's next query
+            result.close()
+
+    paginate(published, sum(totals.values()), 'api/articles/', '', None)
+    for category in categories:
+        paginate(published.filter(Article.category_id == category['id']), totals.get(category['id'], 0),
+                 f"api/categories/{category['id']}/", f"categories/{category['id']}/", category['name'])
+    write('api/categories.json', _json(categories))
+    write('categories/index.html', _templates.get_template('categories.html').render(categories=categories, **site))
+    return files
+
+def export(out_dir, workers=None, per_page=10, force=False, log=None):
+    """Bring `out_dir` up to date with the published blog.
+
+    Articles are re-exported when their updated_at (or their category's)
+    moved since the last run, across `workers` processes (0 exports in this
+    thread). Listings are regenerated when anything they show changed.
+    Files for articles that were unpublished or deleted are removed.
+    Returns counts of what was done.
+    """
+    from settings_store import settings_store
+
+    log = log or (lambda message: None)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = {'articles': {}, 'listings': None, 'listing_files': []}
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    site = {'site_title': settings_store.get('site_title', 'Blog'), 'base': current_app.config['STATIC_EXPORT_BASE_URL']}
+    versions = {
+        str(id): _stamp(article_updated, category_updated)
+        for id, article_updated, category_updated in db.session.execute(
+            select(Article.id, Article.updated_at, Category.updated_at)
+            .outerjoin(Category, Article.category_id == Category.id)
+            .where(Article.status == 'published')
+        )
+    }
+    changed = [int(id) for id, stamp in versions.items() if manifest['articles'].get(id) != stamp]
+    removed = [id for id in manifest['articles'] if id not in versions]
+
+    batch_size = 200
+    pool = ProcessPoolExecutor(workers) if workers != 0 else None
+    try:
+        for start in range(0, len(changed), batch_size):
+            payloads = list(_article_payloads(changed[start:start + batch_size]))
+            if pool is not None:
+                list(pool.map(_write_article, [out_dir] * len(payloads), [site] * len(payloads), payloads))
+            else:
+                for payload in payloads:
+                    _write_article(out_dir, site, payload)
+            log(f'Exported {min(start + batch_size, len(changed))}/{len(changed)} articles')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    for id in removed:
+        _remove(out_dir, f'api/articles/{id}.json')
+        _remove(out_dir, f'articles/{id}.html')
+
+    # Listings also show comment counts, category names and the site title
+    listing_version = hashlib.sha1(repr((
+        sorted(versions.items()),
+        sorted(site.items()),
+        db.session.execute(
+            select(Article.id, Article.comment_count).where(Article.status == 'published').order_by(Article.id)
+        ).all(),
+        db.session.execute(select(Category.id, Category.updated_at).order_by(Category.id)).all(),
+    )).encode('utf-8')).hexdigest()
+    listings = 0
+    if force or listing_version != manifest['listings']:
+        files = _export_listings(out_dir, site, per_page)
+        for relative in set(manifest['listing_files']) - set(files):
+            _remove(out_dir, relative)
+        manifest['listing_files'] = files
+        manifest['listings'] = listing_version
+        listings = len(files)
+
+    manifest['articles'] = versions
+    _write(out_dir, MANIFEST, json.dumps(manifest, indent=1))
+    return {'articles': len(changed), 'removed': len(removed), 'listing_files': listings}
+
+def init_app(app):
+    app.config.setdefault('STATIC_EXPORT_DIR', None)
+    app.config.setdefault('STATIC_EXPORT_ON_WRITE', False)
+    app.config.setdefault('STATIC_EXPORT_BASE_URL', '/')
+    app.extensions['static_export'] = {'lock': threading.Lock(), 'dirty': False, 'running': False}
+
+def notify_write():
+    """Re-export in the background after an article write, if enabled.
+
+    Writes arriving while an export runs are folded into one more run.
+    """
+    app = current_app._get_current_object()
+    if not (app.config['STATIC_EXPORT_ON_WRITE'] and app.config['STATIC_EXPORT_DIR']):
+        return
+    state = app.extensions['static_export']
+    with state['lock']:
+        state['dirty'] = True
+        if state['running']:
+            return
+        state['running'] = True
+    threading.Thread(target=_export_pending, args=(app,), name='static-export', daemon=True).start()
+
+def _export_pending(app):
+    state = app.extensions['static_export']
+    while True:
+        with state['lock']:
+            if not state['dirty']:
+                state['running'] = False
+                return
+            state['dirty'] = False
+        with app.app_context():
+            try:
+                export(app.config['STATIC_EXPORT_DIR'], workers=0)
+            except Exception:
+                app.logger.exception('Static export after write failed')
+            finally:
+                db.session.remove()
@@ -0,0 +1,365 @@
+import json
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.exc import DataError, IntegrityError
+from extensions import db, response_cache
+from models import Article, Category, Comment, ImportIdMap, User
+from counters import adjust_category_count, adjust_comment_counts, count_rows
+from rendering import render_article
+import search
+import static_export
+
+FORMAT = 'chuntian-blog'
+VERSION = 1
+
+# Rows per server-side cursor batch on export, and per transaction on import
+BATCH_SIZE = 1000
+
+# Errors kept in an import report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Exported columns per kind, in export order: every record only refers to
+# kinds written before it
+KINDS = {
+    'user': (User, ('id', 'username', 'email', 'password_hash', 'is_admin', 'created_at')),
+    'category': (Category, ('id', 'name', 'description', 'updated_at')),
+    'article': (Article, ('id', 'title', 'summary', 'content', 'status', 'category_id', 'user_id',
+                          'created_at', 'updated_at')),
+    'comment': (Comment, ('id', 'content', 'status', 'article_id', 'user_id', 'created_at', 'updated_at')),
+}
+
+# Columns holding the id of another kind's record
+REFERENCES = {'category_id': 'category', 'user_id': 'user', 'article_id': 'article'}
+
+# Records matched to an existing row by these columns instead of inserted
+MERGE_KEYS = {'user': ('username', 'email'), 'category': ('name',)}
+
+REQUIRED = {'user': ('username',), 'category': ('name',), 'article': ('title',), 'comment': ('article_id',)}
+
+# Longest value each string column holds, checked before the database does
+LENGTHS = {
+    kind: {column: model.__table__.c[column].type.length for column in columns
+           if getattr(model.__table__.c[column].type, 'length', None)}
+    for kind, (model, columns) in KINDS.items()
+}
+
+class ImportInterrupted(Exception):
+    """A batch failed; batches before it are committed and a rerun resumes."""
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+def export_lines(batch_size=BATCH_SIZE):
+    """Yield the blog's content as NDJSON lines, a header line first.
+
+    Each kind is read through a server-side cursor `batch_size` rows at a
+    time, so memory stays flat however large the tables are. Users carry
+    their password hashes, so the output must be kept private.
+    """
+    yield _dumps({
+        'type': 'header',
+        'format': FORMAT,
+        'version': VERSION,
+        # Identifies this export, so importing it again resumes instead of duplicating
+        'export_id': uuid.uuid4().hex,
+        'exported_at': datetime.utcnow().isoformat(),
+    })
+    for kind, (model, columns) in KINDS.items():
+        statement = select(*(getattr(model, column) for column in columns)) \
+            .order_by(model.id) \
+            .execution_options(yield_per=batch_size)
+        for rows in db.session.execute(statement).partitions():
+            for row in rows:
+                record = {'type': kind}
+                for column, value in zip(columns, row):
+                    record[column] = value.isoformat() if isinstance(value, datetime) else value
+                yield _dumps(record)
+
+def import_lines(lines, dry_run=False, batch_size=BATCH_SIZE, log=None):
+    """Import NDJSON `lines` as written by export_lines; returns a report.
+
+    Records are inserted `batch_size` at a time with one executemany per
+    table, each batch in its own transaction together with the counters
+    and search index entries it affects. Records get new ids; references
+    between them are rewritten through the import_id_map table, which
+    commits with each batch. Running the same export again therefore
+    resumes after the last committed batch and skips what is already in.
+    Users and categories whose username, email or name already exist are
+    mapped to the existing row.
+
+    Invalid records are skipped and reported. A batch the database rejects
+    is retried record by record, so only the offending records are skipped.
+    With `dry_run` every batch is rolled back, so the report shows what an
+    import would do. Articles are rendered on the way in.
+    Raises ValueError if the header is missing or not understood.
+    """
+    lines = iter(lines)
+    header = None
+    for line in lines:
+        if line.strip():
+            try:
+                header = json.loads(line)
+            except ValueError:
+                pass
+            break
+    if not isinstance(header, dict) or header.get('type') != 'header' or header.get('format') != FORMAT:
+        raise ValueError('Not a blog export: the first line must be its header')
+    if header.get('version') != VERSION or not header.get('export_id'):
+        raise ValueError(f"Unsupported export version {header.get('version')!r}")
+
+    importer = _Importer(str(header['export_id'])[:32], dry_run, batch_size, log or (lambda message: None))
+    for number, line in enumerate(lines, 2):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            importer.error(number, 'invalid JSON')
+            continue
+        importer.add(number, record)
+    importer.finish()
+    return importer.report
+
+class _Importer:
+    def __init__(self, job, dry_run, batch_size, log):
+        self.job = job
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.log = log
+        self.kind = None
+        self.pending = []
+        # source id -> new id for the kinds other records refer to
+        self.ids = {kind: {} for kind in set(REFERENCES.values())}
+        # Next id to hand out per kind, so dry-run batches do not reuse ids
+        self.next_ids = {}
+        self.touched = False
+        self.report = {
+            'job': job,
+            'dry_run': dry_run,
+            'inserted': dict.fromkeys(KINDS, 0),
+            'merged': dict.fromkeys(KINDS, 0),
+            'skipped': dict.fromkeys(KINDS, 0),
+            'error_count': 0,
+            'errors': [],
+        }
+
+    def error(self, number, message):
+        self.report['error_count'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append(f'line {number}: {message}')
+
+    def add(self, number, record):
+        kind = record.get('type') if isinstance(record, dict) else None
+        if kind not in KINDS:
+            self.error(number, f'unknown record type {kind!r}')
+            return
+        if not isinstance(record.get('id'), int):
+            self.error(number, 'missing id')
+            return
+        if kind != self.kind:
+            self._flush()
+            self.kind = kind
+        self.pending.append((number, record))
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+
+    def finish(self):
+        self._flush()
+        if self.touched and not self.dry_run:
+            response_cache.invalidate('articles', 'categories', 'comments:all', 'trending')
+            static_export.notify_write()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            try:
+                self._apply(self._run(batch))
+            except (IntegrityError, DataError) as exc:
+                # One record the database rejects must not stop the import:
+                # like the comment queue, retry the batch one record at a time
+                self.log(f'{self.kind}: lines {batch[0][0]}-{batch[-1][0]} rejected ({exc.orig}), retrying one by one')
+                for number, record in batch:
+                    try:
+                        self._apply(self._run([(number, record)]))
+                    except (IntegrityError, DataError) as exc:
+                        self.error(number, f"{self.kind} {record['id']} rejected by the database: {exc.orig}")
+        except Exception as exc:
+            raise ImportInterrupted(
+                f'Import stopped at lines {batch[0][0]}-{batch[-1][0]}: {exc}. Run it again to resume.'
+            ) from exc
+        done = sum(self.report[key][self.kind] for key in ('inserted', 'merged', 'skipped'))
+        self.log(f'{self.kind}: {done} done, through line {batch[-1][0]}')
+
+    def _run(self, batch):
+        """Import `batch` in one transaction and return its outcome.
+
+        Nothing outside the database changes here, so a failed attempt can
+        be retried as if it never ran; _apply records the outcome.
+        """
+        outcome = {'inserted': 0, 'merged': 0, 'skipped': 0, 'ids': {}, 'errors': [], 'next_id': None}
+        try:
+            self._import_batch(self.kind, batch, outcome)
+            if self.dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return outcome
+
+    def _apply(self, outcome):
+        kind = self.kind
+        for key in ('inserted', 'merged', 'skipped'):
+            self.report[key][kind] += outcome[key]
+        if kind in self.ids:
+            self.ids[kind].update(outcome['ids'])
+        if outcome['next_id'] is not None:
+            self.next_ids[kind] = outcome['next_id']
+        if outcome['inserted']:
+            self.touched = True
+        for number, message in outcome['errors']:
+            self.error(number, message)
+
+    def _import_batch(self, kind, batch, outcome):
+        model, columns = KINDS[kind]
+        ids = outcome['ids']
+        mapped = dict(db.session.execute(
+            select(ImportIdMap.source_id, ImportIdMap.target_id)
+            .where(ImportIdMap.job == self.job, ImportIdMap.kind == kind,
+                   ImportIdMap.source_id.in_([record['id'] for _, record in batch]))
+        ).all())
+
+        rows, sources = [], []
+        for number, record in batch:
+            if record['id'] in mapped:
+                # Committed by an earlier run of this import
+                outcome['skipped'] += 1
+                ids[record['id']] = mapped[record['id']]
+                continue
+            row = self._row(number, kind, columns, record, outcome['errors'])
+            if row is not None:
+                rows.append(row)
+                sources.append(record['id'])
+        if not rows:
+            return
+
+        existing = self._existing(kind, rows)
+        next_id = self._reserve(kind, model)
+        inserts, links = [], []
+        for source_id, row in zip(sources, rows):
+            target_id = next((existing[(key, row[key])] for key in MERGE_KEYS.get(kind, ())
+                              if row[key] is not None and (key, row[key]) in existing), None)
+            if target_id is None:
+                target_id = row['id'] = next_id
+                next_id += 1
+                inserts.append(row)
+                # Later rows of this batch with the same name merge into this one
+                for key in MERGE_KEYS.get(kind, ()):
+                    if row[key] is not None:
+                        existing[(key, row[key])] = target_id
+            else:
+                outcome['merged'] += 1
+            links.append({'job': self.job, 'kind': kind, 'source_id': source_id, 'target_id': target_id})
+            ids[source_id] = target_id
+        outcome['next_id'] = next_id
+
+        if inserts:
+            db.session.execute(insert(model), inserts)
+            self._count(kind, inserts)
+            outcome['inserted'] += len(inserts)
+        db.session.execute(insert(ImportIdMap), links)
+
+    def _row(self, number, kind, columns, record, errors):
+        """The insertable row for `record`, or None after adding to `errors` why not."""
+        row = {}
+        for column in columns:
+            value = record.get(column)
+            if column in REFERENCES:
+                if value is not None:
+                    value = self.ids[REFERENCES[column]].get(value)
+                    if value is None and column == 'article_id':
+                        errors.append((number, f"{kind} {record['id']} refers to unknown article {record.get(column)}"))
+                        return None
+            elif column in ('created_at', 'updated_at') and value is not None:
+                try:
+                    value = datetime.fromisoformat(value)
+                except (TypeError, ValueError):
+                    errors.append((number, f'invalid {column} {value!r}'))
+                    return None
+            elif column in LENGTHS[kind] and value is not None:
+                if not isinstance(value, str):
+                    errors.append((number, f"{kind} {record['id']} {column} is not a string"))
+                    return None
+                if len(value) > LENGTHS[kind][column]:
+                    errors.append((number, f"{kind} {record['id']} {column} is longer than "
+                                           f"{LENGTHS[kind][column]} characters"))
+                    return None
+            row[column] = value
+        for column in REQUIRED[kind]:
+            if row.get(column) in (None, ''):
+                errors.append((number, f"{kind} {record['id']} has no {column}"))
+                return None
+        if kind in ('article', 'comment'):
+            row['created_at'] = row['created_at'] or datetime.utcnow()
+            row['updated_at'] = row['updated_at'] or row['created_at']
+            row['status'] = row['status'] or ('published' if kind == 'article' else 'pending')
+        if kind == 'article':
+            # Rendered now, as the write routes do, instead of on every view
+            article = SimpleNamespace(content=row['content'], content_html=None, toc=None, content_hash=None)
+            if article.content is not None:
+                render_article(article)
+            row.update(content_html=article.content_html, toc=article.toc, content_hash=article.content_hash)
+        if kind == 'category':
+            row['updated_at'] = row['updated_at'] or datetime.utcnow()
+        if kind == 'user':
+            row['is_admin'] = bool(row['is_admin'])
+        return row
+
+    def _existing(self, kind, rows):
+        """{(column, value): id} of rows already present that `rows` merge into."""
+        keys = MERGE_KEYS.get(kind)
+        if not keys:
+            return {}
+        model = KINDS[kind][0]
+        criteria = [getattr(model, key).in_({row[key] for row in rows if row[key] is not None}) for key in keys]
+        existing = {}
+        found = db.session.execute(select(model.id, *(getattr(model, key) for key in keys)).where(or_(*criteria)))
+        for row in found:
+            for key, value in zip(keys, row[1:]):
+                if value is not None:
+                    existing[(key, value)] = row.id
+        return existing
+
+    def _reserve(self, kind, model):
+        """The first id this batch may hand out."""
+        # Explicit ids make every batch one executemany on any backend. A
+        # row the site inserts meanwhile can collide with one; the batch then
+        # fails and is retried record by record, each from a fresh MAX(id).
+        top = db.session.execute(select(func.max(model.id))).scalar() or 0
+        return max(self.next_ids.get(kind, 0), top + 1)
+
+    def _count(self, kind, rows):
+        # The same counters and index the write routes maintain
+        if kind == 'user':
+            count_rows('user', [(row['created_at'], None) for row in rows if row['created_at'] is not None])
+        elif kind == 'article':
+            categories = {}
+            for row in rows:
+                key = (row['category_id'], row['status'])
+                categories[key] = categories.get(key, 0) + 1
+            for (category_id, status), delta in categories.items():
+                adjust_category_count(category_id, status, delta)
+            count_rows('article', [(row['created_at'], row['status']) for row in rows])
+            search.index_rows([SimpleNamespace(**row) for row in rows])
+        elif kind == 'comment':
+            approved = {}
+            for row in rows:
+                if row['status'] == 'approved':
+                    approved[row['article_id']] = approved.get(row['article_id'], 0) + 1
+            adjust_comment_counts(approved)
+            count_rows('comment', [(row['created_at'], row['status']) for row in rows])
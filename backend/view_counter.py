@@ -0,0 +1,172 @@
+import atexit
+import math
+import threading
+import time
+from datetime import datetime
+from functools import wraps
+from flask import current_app
+from sqlalchemy import bindparam, select, update
+from extensions import db, response_cache
+from models import Article
+
+# Scores are log-space view counts decayed relative to this instant
+EPOCH = datetime(2026, 1, 1)
+
+# Articles per SELECT ... FOR UPDATE and executemany UPDATE when flushing
+FLUSH_CHUNK_SIZE = 500
+
+def _log_add(a, b):
+    # log(e^a + e^b) without overflowing
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+class ViewCounter:
+    """Per-process article view counts, written to the database in batches.
+
+    record() only bumps a dict entry, so readers of a hot article never
+    queue on its row. A flusher thread adds the counts to view_count every
+    VIEW_FLUSH_INTERVAL seconds with one executemany per chunk, and once
+    more at interpreter exit; a process that is killed outright loses at
+    most one interval of views.
+
+    Each flush also folds the views into trending_score, the log of the
+    article's views each weighted by 2 ** (age / TRENDING_HALF_LIFE_HOURS)
+    relative to EPOCH. Decay scales every article's total by the same
+    factor, so ordering by the stored score ranks by decayed views at any
+    moment without ever rewriting old rows. Changing the half-life only
+    applies to views counted afterwards.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('VIEW_COUNTING', True)
+        app.config.setdefault('VIEW_FLUSH_INTERVAL', 10)
+        app.config.setdefault('TRENDING_HALF_LIFE_HOURS', 24)
+        app.extensions['view_counter'] = _Tally(app)
+
+    @property
+    def _tally(self):
+        return current_app.extensions['view_counter']
+
+    def counted(self, view):
+        """Count a view of article `id` for every 200 or 304 `view` returns."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304) and current_app.config['VIEW_COUNTING']:
+                self._tally.record(kwargs['id'])
+            return response
+        return wrapper
+
+    def pending(self):
+        """Views recorded in this process but not flushed, by article id."""
+        return self._tally.snapshot()
+
+    def flush(self):
+        """Write the pending views in the calling thread."""
+        self._tally.flush()
+
+    def decayed(self, score, now=None):
+        """A stored trending_score as the number of views it is worth at `now`."""
+        if score is None:
+            return 0.0
+        now = now or datetime.utcnow()
+        return math.exp(score - _rate(current_app) * (now - EPOCH).total_seconds())
+
+def _rate(app):
+    return math.log(2) / (app.config['TRENDING_HALF_LIFE_HOURS'] * 3600)
+
+class _Tally:
+    def __init__(self, app):
+        self.app = app
+        self.counts = {}
+        self.lock = threading.Lock()
+        # Serializes flushes from the thread, flush() and exit
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def record(self, article_id):
+        with self.lock:
+            self.counts[article_id] = self.counts.get(article_id, 0) + 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='view-flusher', daemon=True)
+                self.thread.start()
+                atexit.register(self.stop)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self.stopping.wait(self.app.config['VIEW_FLUSH_INTERVAL']):
+            self.flush()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                counts, self.counts = self.counts, {}
+            if not counts:
+                return
+            with self.app.app_context():
+                try:
+                    _write(counts, time.time())
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Flushing %d article views failed, retrying next interval',
+                                              sum(counts.values()))
+                    # _write removed what it committed; keep the rest
+                    with self.lock:
+                        for article_id, views in counts.items():
+                            self.counts[article_id] = self.counts.get(article_id, 0) + views
+                finally:
+                    db.session.remove()
+
+def _write(counts, timestamp):
+    """Add `counts` ({article_id: views}) to the articles, chunk by chunk.
+
+    Each chunk is removed from `counts` once committed.
+    """
+    # Views are stamped with the flush time, which is off by at most one
+    # interval and makes every article in the batch gain the same weight
+    age = timestamp - (EPOCH - datetime(1970, 1, 1)).total_seconds()
+    boost = _rate(current_app) * age
+    ids = sorted(counts)
+    for start in range(0, len(ids), FLUSH_CHUNK_SIZE):
+        chunk = ids[start:start + FLUSH_CHUNK_SIZE]
+        # Locked so flushes from other processes add up instead of racing;
+        # deleted articles drop out here
+        rows = db.session.execute(
+            select(Article.id, Article.trending_score).where(Article.id.in_(chunk)).with_for_update()
+        ).all()
+        if not rows:
+            for id in chunk:
+                del counts[id]
+            continue
+        table = Article.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('article_id'))
+            .values(view_count=table.c.view_count + bindparam('views'), trending_score=bindparam('score'),
+                    # Being read is not an edit
+                    updated_at=table.c.updated_at),
+            [{'article_id': id, 'views': counts[id], 'score': _log_add(score, math.log(counts[id]) + boost)}
+             for id, score in rows]
+        )
+        db.session.commit()
+        for id in chunk:
+            del counts[id]
+    response_cache.invalidate('trending')
+
+view_counter = ViewCounter()
@@ -0,0 +1,49 @@
+import os
+import sys
+import threading
+
+# Benchmarks import the backend the same way the tests do
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from sqlalchemy import event
+from app import create_app
+from extensions import db
+
+BENCH_ADMIN = ('bench_admin', 'bench-password')
+BENCH_USER = ('bench_user', 'bench-password')
+
+def make_app(database_url, **overrides):
+    """Build the real app against `database_url` with optional config overrides."""
+    class BenchConfig:
+        SECRET_KEY = 'bench_key'
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    for key, value in overrides.items():
+        setattr(BenchConfig, key, value)
+    return create_app(BenchConfig)
+
+class StatementCounter:
+    """Counts SQL statements sent through the app's engine, from any thread."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
@@ -0,0 +1,357 @@
+"""Drive every API endpoint and report latency, throughput and SQL per request.
+
+    python benchmarks/run.py --database-url sqlite:///bench.db \\
+        --mode both --concurrency 1,8 --requests 200 --output bench.json
+
+`client` mode calls the app through Flask's test client (no network, shows
+the app's own cost); `server` mode runs it behind a threaded local WSGI
+server and talks HTTP. Each route is measured on its own so the SQL
+statement count per request can be read off the engine.
+"""
+import argparse
+import http.cookiejar
+import itertools
+import json
+import logging
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from werkzeug.serving import make_server
+from common import BENCH_ADMIN, BENCH_USER, StatementCounter, db, make_app, percentile
+from models import Article
+from seed import add_scratch
+
+# Pages deep the cursor scenario reads, like the offset one's page range
+CURSOR_PAGES = 50
+
+class Scenario:
+    """One endpoint to hit.
+
+    `path`, `body` and `headers` are callables taking (rng, ctx) so each
+    request can vary its ids and pages; `role` picks which logged-in client
+    sends it. Requests with headers go out without the client's cookies.
+    """
+
+    def __init__(self, name, method, path, body=None, role=None, headers=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.role = role
+        self.headers = headers
+
+def _scenarios():
+    def article_id(rng, ctx):
+        return rng.choice(ctx['article_ids'])
+
+    # Write scenarios work on scratch rows from seed.add_scratch so reads stay comparable
+    def scratch_id(rng, ctx, use):
+        return rng.choice(ctx['scratch'][use])
+
+    def take(ctx, use):
+        return ctx['scratch'][use].pop()
+
+    def unique(ctx, prefix):
+        return f"{prefix} {ctx['scratch']['tag']} {next(ctx['serial'])}"
+
+    def new_user(rng, ctx):
+        name = unique(ctx, 'bench').replace(' ', '_')
+        return {'username': name, 'email': f'{name}@bench.local', 'password': BENCH_USER[1]}
+
+    return [
+        Scenario('GET /api/articles', 'GET', lambda rng, ctx: f'/api/articles?page={rng.randint(1, 50)}'),
+        Scenario('GET /api/articles (admin, per_page=100)', 'GET',
+                 lambda rng, ctx: f'/api/articles?per_page=100&page={rng.randint(1, 20)}', role='admin'),
+        Scenario('GET /api/articles?cursor', 'GET',
+                 lambda rng, ctx: '/api/articles?limit=10' + rng.choice(ctx['cursors'])),
+        Scenario('GET /api/articles/<id>', 'GET', lambda rng, ctx: f'/api/articles/{article_id(rng, ctx)}'),
+        Scenario('GET /api/articles/<id>?format=html', 'GET',
+                 lambda rng, ctx: f'/api/articles/{article_id(rng, ctx)}?format=html'),
+        Scenario('GET /api/articles/search', 'GET',
+                 lambda rng, ctx: '/api/articles/search?q='
+                 + urllib.parse.quote(rng.choice(['flask', 'cache', '\u6570\u636e\u5e93', 'mysql index']))),
+        Scenario('GET /api/categories', 'GET', lambda rng, ctx: '/api/categories'),
+        Scenario('GET /api/comments?article_id', 'GET',
+                 lambda rng, ctx: f'/api/comments?article_id={article_id(rng, ctx)}'),
+        Scenario('GET /api/comments (admin)', 'GET', lambda rng, ctx: '/api/comments?status=pending&limit=50',
+                 role='admin'),
+        Scenario('GET /api/settings', 'GET', lambda rng, ctx: '/api/settings'),
+        Scenario('GET /auth/me', 'GET', lambda rng, ctx: '/auth/me', role='user'),
+        Scenario('POST /auth/register', 'POST', lambda rng, ctx: '/auth/register',
+                 body=new_user),
+        Scenario('POST /auth/login', 'POST', lambda rng, ctx: '/auth/login',
+                 body=lambda rng, ctx: {'username': BENCH_USER[0], 'password': BENCH_USER[1]}),
+        # Sessions live in the signed cookie, so one login can be logged out again and again
+        Scenario('POST /auth/logout', 'POST', lambda rng, ctx: '/auth/logout',
+                 headers=lambda rng, ctx: {'Cookie': ctx['user_session']}),
+        Scenario('POST /api/comments', 'POST', lambda rng, ctx: '/api/comments', role='user',
+                 body=lambda rng, ctx: {'content': 'Benchmark comment', 'article_id': ctx['scratch']['comment_parent']}),
+        Scenario('POST /api/articles', 'POST', lambda rng, ctx: '/api/articles', role='admin',
+                 body=lambda rng, ctx: {'title': 'Bench', 'content': '# Bench\n\nBody', 'status': 'draft'}),
+        Scenario('PUT /api/articles/<id>', 'PUT',
+                 lambda rng, ctx: f"/api/articles/{scratch_id(rng, ctx, 'edit_articles')}", role='admin',
+                 body=lambda rng, ctx: {'summary': f'Edited {rng.random()}'}),
+        Scenario('PUT /api/comments/<id>/status', 'PUT',
+                 lambda rng, ctx: f"/api/comments/{scratch_id(rng, ctx, 'edit_comments')}/status", role='admin',
+                 body=lambda rng, ctx: {'status': rng.choice(['approved', 'rejected'])}),
+        Scenario('POST /api/categories', 'POST', lambda rng, ctx: '/api/categories', role='admin',
+                 body=lambda rng, ctx: {'name': unique(ctx, 'Bench')}),
+        Scenario('PUT /api/categories/<id>', 'PUT',
+                 lambda rng, ctx: f"/api/categories/{scratch_id(rng, ctx, 'edit_categories')}", role='admin',
+                 body=lambda rng, ctx: {'name': unique(ctx, 'Renamed'), 'description': 'Edited'}),
+        Scenario('POST /api/settings', 'POST', lambda rng, ctx: '/api/settings', role='admin',
+                 body=lambda rng, ctx: {'site_title': f'Bench {rng.randint(1, 9)}'}),
+        Scenario('DELETE /api/articles/<id>', 'DELETE',
+                 lambda rng, ctx: f"/api/articles/{take(ctx, 'delete_articles')}", role='admin'),
+        Scenario('DELETE /api/categories/<id>', 'DELETE',
+                 lambda rng, ctx: f"/api/categories/{take(ctx, 'delete_categories')}", role='admin'),
+        Scenario('DELETE /api/comments/<id>', 'DELETE',
+                 lambda rng, ctx: f"/api/comments/{take(ctx, 'delete_comments')}", role='admin'),
+    ]
+
+def _context(app, requests):
+    """Ids the scenarios draw from, cursors to deep pages and scratch rows for writes."""
+    with app.app_context():
+        article_ids = [id for (id,) in db.session.query(Article.id).filter_by(status='published').limit(5000)]
+        if not article_ids:
+            raise SystemExit('No published articles; run benchmarks/seed.py first')
+        scratch = add_scratch(requests)
+
+    client = app.test_client()
+    # Follow next_cursor from the first page so requests spread over CURSOR_PAGES pages
+    cursors, cursor = [''], None
+    while len(cursors) < CURSOR_PAGES:
+        cursor = client.get('/api/articles?limit=10' + cursors[-1]).json['next_cursor']
+        if cursor is None:
+            break
+        cursors.append(f'&cursor={cursor}')
+
+    _login(lambda method, path, body: client.open(path, method=method, json=body).status_code, 'user')
+    session = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    return {
+        'article_ids': article_ids,
+        'cursors': cursors,
+        'scratch': scratch,
+        'serial': itertools.count(),
+        'user_session': f'{session.key}={session.value}',
+    }
+
+# Logins at once beyond PASSWORD_HASH_MAX_PENDING get 429 until the hashing
+# pool drains; workers back off and retry this many times before giving up
+LOGIN_ATTEMPTS = 8
+
+def _login(send, role):
+    """Log in as the benchmark `role` through `send(method, path, body)` -> status."""
+    username, password = BENCH_ADMIN if role == 'admin' else BENCH_USER
+    delay = 0.05
+    for _ in range(LOGIN_ATTEMPTS):
+        status = send('POST', '/auth/login', {'username': username, 'password': password})
+        if status != 429:
+            break
+        time.sleep(delay * random.uniform(1, 2))
+        delay *= 2
+    if status != 200:
+        raise RuntimeError(f'Logging in as {username} failed with {status}')
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def _client(self, role):
+        clients = self._local.__dict__.setdefault('clients', {})
+        if role not in clients:
+            client = self.app.test_client()
+            if role:
+                _login(lambda method, path, body: client.open(path, method=method, json=body).status_code, role)
+            clients[role] = client
+        return clients[role]
+
+    def warm(self, role):
+        self._client(role)
+
+    def request(self, method, path, body, role, headers=None):
+        if headers:
+            # The client's cookie jar would replace a Cookie header
+            client = self._local.__dict__.setdefault('bare', self.app.test_client(use_cookies=False))
+        else:
+            client = self._client(role)
+        return client.open(path, method=method, json=body, headers=headers).status_code
+
+    def close(self):
+        pass
+
+class ServerDriver:
+    def __init__(self, app):
+        # One access log line per request would swamp the report
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self._local = threading.local()
+
+    def _opener(self, role):
+        openers = self._local.__dict__.setdefault('openers', {})
+        if role not in openers:
+            opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+            if role:
+                _login(lambda method, path, body: self._send(opener, method, path, body), role)
+            openers[role] = opener
+        return openers[role]
+
+    def _send(self, opener, method, path, body, headers=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base + path, data=data, method=method, headers=headers or {})
+        if data is not None:
+            request.add_header('Content-Type', 'application/json')
+        try:
+            with opener.open(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+
+    def warm(self, role):
+        self._opener(role)
+
+    def request(self, method, path, body, role, headers=None):
+        opener = urllib.request.build_opener() if headers else self._opener(role)
+        return self._send(opener, method, path, body, headers)
+
+    def close(self):
+        self.server.shutdown()
+
+def run_scenario(driver, engine, scenario, ctx, requests, concurrency, seed):
+    rng = random.Random(seed)
+    # Draw every path and body up front so workers only send requests
+    plan = []
+    for _ in range(requests):
+        path = scenario.path(rng, ctx)
+        body = scenario.body(rng, ctx) if scenario.body else None
+        headers = scenario.headers(rng, ctx) if scenario.headers else None
+        plan.append((path, body, headers))
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def send(item):
+        nonlocal errors
+        path, body, headers = item
+        started = time.perf_counter()
+        status = driver.request(scenario.method, path, body, scenario.role, headers)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if status >= 400:
+                errors += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # Log in every worker before the clock starts
+        list(pool.map(lambda _: driver.warm(scenario.role), range(concurrency)))
+        with StatementCounter(engine) as counter:
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            list(pool.map(send, plan))
+            wall = time.perf_counter() - started
+            cpu = time.process_time() - cpu_started
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    return {
+        'route': scenario.name,
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'throughput_rps': round(requests / wall, 1) if wall else None,
+        # Process CPU, so in client mode the app's own cost plus the driver's
+        'cpu_ms_per_request': ms(cpu / requests) if requests else None,
+        'sql_per_request': round(counter.count / requests, 2) if requests else None,
+    }
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(database_url, modes=('client',), concurrency=(1,), requests=100, routes=None, seed=42,
+        config=None, log=print):
+    app = make_app(database_url, **(config or {}))
+    with app.app_context():
+        engine = db.engine
+
+    scenarios = [s for s in _scenarios() if not routes or any(r in s.name for r in routes)]
+    results = []
+    for mode in modes:
+        for level in concurrency:
+            # Write scenarios need fresh scratch rows every pass
+            ctx = _context(app, requests)
+            driver = TestClientDriver(app) if mode == 'client' else ServerDriver(app)
+            try:
+                for scenario in scenarios:
+                    result = run_scenario(driver, engine, scenario, ctx, requests, level, seed)
+                    result['mode'] = mode
+                    results.append(result)
+                    log(f"{mode:6} c={level:<3} {result['route']:45} p50={result['p50_ms']}ms "
+                        f"p99={result['p99_ms']}ms cpu={result['cpu_ms_per_request']}ms {result['throughput_rps']} req/s "
+                        f"sql={result['sql_per_request']} errors={result['errors']}")
+            finally:
+                driver.close()
+
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'database': engine.dialect.name,
+            'requests_per_route': requests,
+            'config': config or {},
+        },
+        'results': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--mode', choices=['client', 'server', 'both'], default='client')
+    parser.add_argument('--concurrency', default='1', help='Comma separated, e.g. 1,8,32')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per route per concurrency level')
+    parser.add_argument('--route', action='append', help='Only run routes whose name contains this (repeatable)')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the response cache')
+    parser.add_argument('--no-fragments', action='store_true', help='Disable the pre-encoded article summaries')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    config = {'RESPONSE_CACHE_BACKEND': 'null'} if args.no_cache else {}
+    if args.no_fragments:
+        config['ARTICLE_FRAGMENT_CACHE_SIZE'] = 0
+    report = run(
+        args.database_url,
+        modes=['client', 'server'] if args.mode == 'both' else [args.mode],
+        concurrency=[int(c) for c in args.concurrency.split(',')],
+        requests=args.requests,
+        routes=args.route,
+        seed=args.seed,
+        config=config,
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Fill a database with realistic blog volumes for benchmarking.
+
+    python benchmarks/seed.py --database-url sqlite:///bench.db --scale 0.01
+
+Defaults are production-like (100k articles, 2M comments, 500 categories,
+50k users); --scale multiplies all of them. Generation is deterministic for
+a given --seed, so runs on different branches see the same data.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from common import BENCH_ADMIN, BENCH_USER, db, make_app
+from models import Article, Category, Comment, Setting, User
+import counters
+import rendering
+import search
+
+WORDS = (
+    'flask python database index query cache latency vue router deploy nginx '
+    'mysql sqlite thread process memory profile benchmark request response '
+    'markdown article comment category session cookie token pool replica'
+).split()
+CJK_WORDS = '数据库 索引 缓存 性能 部署 查询 优化 博客 文章 评论 分类 服务器 并发 线程'.split()
+
+def _paragraph(rng, words):
+    parts = []
+    for _ in range(words):
+        parts.append(rng.choice(CJK_WORDS) if rng.random() < 0.3 else rng.choice(WORDS))
+    return ' '.join(parts).capitalize() + '.'
+
+def _content(rng):
+    sections = []
+    for _ in range(rng.randint(2, 6)):
+        sections.append(f'## {_paragraph(rng, 3)}')
+        sections.extend(_paragraph(rng, rng.randint(30, 120)) for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.3:
+            sections.append('```python\nprint("hello")\n```')
+    return '\n\n'.join(sections)
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+def seed(database_url, articles, comments, categories, users, batch_size=5000, seed_value=42,
+         reset=False, render=False, index=True, log=print):
+    rng = random.Random(seed_value)
+    app = make_app(database_url)
+    with app.app_context():
+        if reset:
+            db.drop_all()
+        db.create_all()
+        if db.session.query(User.id).first() is not None:
+            raise SystemExit('Database is not empty; pass --reset to start over')
+
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        # Hashing 50k passwords would dominate seeding; every user shares one
+        shared_hash = generate_password_hash('bench-password')
+
+        rows = [
+            {'id': 1, 'username': BENCH_ADMIN[0], 'email': 'admin@bench.local',
+             'password_hash': generate_password_hash(BENCH_ADMIN[1]), 'is_admin': True},
+            {'id': 2, 'username': BENCH_USER[0], 'email': 'user@bench.local',
+             'password_hash': generate_password_hash(BENCH_USER[1]), 'is_admin': False},
+        ]
+        db.session.execute(insert(User), rows)
+        for start, count in _chunks(max(users - 2, 0), batch_size):
+            db.session.execute(insert(User), [
+                {'id': i + 3, 'username': f'user{i}', 'email': f'user{i}@bench.local',
+                 'password_hash': shared_hash, 'is_admin': False}
+                for i in range(start, start + count)
+            ])
+        db.session.commit()
+        log(f'users: {users}')
+
+        db.session.execute(insert(Category), [
+            {'id': i + 1, 'name': f'Category {i + 1}', 'description': _paragraph(rng, 8), 'updated_at': now}
+            for i in range(categories)
+        ])
+        db.session.commit()
+        log(f'categories: {categories}')
+
+        for start, count in _chunks(articles, batch_size):
+            batch = []
+            for i in range(start, start + count):
+                created = now - timedelta(minutes=(articles - i) * 7)
+                content = _content(rng)
+                row = {
+                    'id': i + 1,
+                    'title': _paragraph(rng, rng.randint(3, 8))[:140],
+                    'summary': _paragraph(rng, rng.randint(10, 30))[:500],
+                    'content': content,
+                    # Mostly published, like a real archive
+                    'status': rng.choices(['published', 'draft', 'private'], [90, 8, 2])[0],
+                    'category_id': rng.randint(1, categories) if categories else None,
+                    'user_id': 1,
+                    'created_at': created,
+                    'updated_at': created,
+                }
+                if render:
+                    html, toc = rendering.render_markdown(content)
+                    row.update(content_html=html, toc=json.dumps(toc, ensure_ascii=False),
+                               content_hash=rendering.content_hash(content))
+                batch.append(row)
+            db.session.execute(insert(Article), batch)
+            db.session.commit()
+        log(f'articles: {articles}')
+
+        statuses = ['approved', 'pending', 'rejected']
+        for start, count in _chunks(comments, batch_size):
+            batch = []
+            for i in range(start, start + count):
+                # Half spread evenly, half piled onto a few popular posts
+                if rng.random() < 0.5:
+                    article_id = rng.randint(1, articles)
+                else:
+                    article_id = min(articles, int(rng.paretovariate(1.2)))
+                created = now - timedelta(seconds=(comments - i) * 13)
+                batch.append({
+                    'id': i + 1,
+                    'content': _paragraph(rng, rng.randint(5, 40))[:500],
+                    'article_id': article_id,
+                    'user_id': rng.randint(1, max(users, 1)),
+                    'status': rng.choices(statuses, [85, 10, 5])[0],
+                    'created_at': created,
+                    'updated_at': created,
+                })
+            db.session.execute(insert(Comment), batch)
+            db.session.commit()
+        log(f'comments: {comments}')
+
+        db.session.execute(insert(Setting), [
+            {'key': 'site_title', 'value': 'Bench Blog', 'updated_at': now},
+            {'key': 'allow_comments', 'value': 'true', 'updated_at': now},
+        ])
+        counters.rebuild_category_counts()
+        counters.rebuild_comment_counts()
+        counters.rebuild_rollups()
+        db.session.commit()
+        if index:
+            search.rebuild(batch_size=batch_size)
+            log('search index rebuilt')
+
+        log(f'seeded in {time.perf_counter() - started:.1f}s')
+
+def add_scratch(count):
+    """Add rows for write benchmarks to edit and delete; returns their ids by use.
+
+    Scratch articles are uncategorised drafts and scratch comments pending
+    replies to one of them, so public article and comment reads never see
+    them; only the category list grows by the empty scratch categories.
+    Names carry a random tag so repeated runs do not collide. The rollups
+    count the rows like the write routes would, and stay exact once they are
+    deleted again. Call inside an app context.
+    """
+    tag = uuid.uuid4().hex[:8]
+    now = datetime.utcnow()
+
+    def articles():
+        return [Article(title=f'Scratch {tag}', content='Scratch', status='draft', user_id=1,
+                        created_at=now, updated_at=now) for _ in range(count)]
+
+    def categories(use):
+        return [Category(name=f'Scratch {tag} {use} {i}', updated_at=now) for i in range(count)]
+
+    scratch = {
+        'edit_articles': articles(),
+        'delete_articles': articles(),
+        'edit_categories': categories('edit'),
+        'delete_categories': categories('delete'),
+    }
+    for rows in scratch.values():
+        db.session.add_all(rows)
+    db.session.flush()
+    parent = scratch['edit_articles'][0].id
+    scratch['edit_comments'], scratch['delete_comments'] = (
+        [Comment(content='Scratch', article_id=parent, user_id=2, status='pending',
+                 created_at=now, updated_at=now) for _ in range(count)]
+        for _ in range(2)
+    )
+    db.session.add_all(scratch['edit_comments'] + scratch['delete_comments'])
+    counters.count_rows('article', [(now, 'draft')] * (2 * count))
+    counters.count_rows('comment', [(now, 'pending')] * (2 * count))
+    db.session.commit()
+
+    ids = {use: [row.id for row in rows] for use, rows in scratch.items()}
+    ids['comment_parent'] = parent
+    ids['tag'] = tag
+    return ids
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every volume by this factor')
+    parser.add_argument('--articles', type=int, default=100_000)
+    parser.add_argument('--comments', type=int, default=2_000_000)
+    parser.add_argument('--categories', type=int, default=500)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='Drop all tables first')
+    parser.add_argument('--render', action='store_true', help='Pre-render article HTML')
+    parser.add_argument('--no-index', action='store_true', help='Skip building the search index')
+    args = parser.parse_args()
+
+    def scaled(n, minimum):
+        return max(minimum, int(n * args.scale))
+
+    seed(
+        args.database_url,
+        articles=scaled(args.articles, 1),
+        comments=scaled(args.comments, 0),
+        categories=scaled(args.categories, 1),
+        users=scaled(args.users, 2),
+        batch_size=args.batch_size,
+        seed_value=args.seed,
+        reset=args.reset,
+        render=args.render,
+        index=not args.no_index,
+    )
+
+if __name__ == '__main__':
+    main()
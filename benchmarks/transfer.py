@@ -0,0 +1,95 @@
+"""Measure the throughput of NDJSON content export and import.
+
+    python benchmarks/transfer.py --database-url sqlite:///bench.db --output transfer.json
+
+Exports the (seeded) source database to a temporary NDJSON file, then
+imports it into a fresh target database, first as a dry run and then for
+real. Reports records per second, file size and the process's peak RSS
+after each step; export and import are meant to stay flat in memory.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+from datetime import datetime, timezone
+from common import db, make_app
+from run import _git_commit
+import transfer
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+def _step(name, records, started, log, **extra):
+    seconds = time.perf_counter() - started
+    result = {
+        'step': name,
+        'records': records,
+        'seconds': round(seconds, 2),
+        'records_per_second': round(records / seconds) if seconds else None,
+        'peak_rss_mb': _peak_rss_mb(),
+        **extra,
+    }
+    log(f"{name:14} {records} records in {result['seconds']}s = {result['records_per_second']} rec/s "
+        f"peak rss {result['peak_rss_mb']} MB")
+    return result
+
+def run(database_url, target_url=None, batch_size=transfer.BATCH_SIZE, log=print):
+    workdir = tempfile.mkdtemp(prefix='blog-transfer-')
+    path = os.path.join(workdir, 'export.ndjson')
+    target_url = target_url or f"sqlite:///{os.path.join(workdir, 'target.db')}"
+    results = []
+
+    source = make_app(database_url)
+    with source.app_context():
+        started = time.perf_counter()
+        records = -1 # not counting the header
+        with open(path, 'w', encoding='utf-8') as f:
+            for line in transfer.export_lines(batch_size=batch_size):
+                f.write(line)
+                records += 1
+        results.append(_step('export', records, started, log, bytes=os.path.getsize(path)))
+        database = db.engine.dialect.name
+
+    target = make_app(target_url)
+    with target.app_context():
+        db.create_all()
+        for name, dry_run in (('import dry-run', True), ('import', False)):
+            started = time.perf_counter()
+            with open(path, encoding='utf-8') as f:
+                report = transfer.import_lines(f, dry_run=dry_run, batch_size=batch_size)
+            handled = sum(sum(report[key].values()) for key in ('inserted', 'merged', 'skipped'))
+            results.append(_step(name, handled, started, log, errors=report['error_count']))
+
+    os.remove(path)
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'database': database,
+            'target': target_url,
+            'batch_size': batch_size,
+        },
+        'results': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database-url', required=True, help='Database to export')
+    parser.add_argument('--target-url', help='Empty database to import into (default: a temporary SQLite file)')
+    parser.add_argument('--batch-size', type=int, default=transfer.BATCH_SIZE)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    report = run(args.database_url, target_url=args.target_url, batch_size=args.batch_size)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+import asyncio
+import threading
 import pytest
 import sys
 import os
@@ -8,24 +10,51 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../back
 from app import create_app
 from extensions import db
 from models import User
+from view_counter import view_counter
+
+def pytest_generate_tests(metafunc):
+    # Everything that talks HTTP runs against the WSGI app and the ASGI entry
+    # point, unless the test pins `serving` itself: tests counting statements
+    # on db.engine only see the WSGI side, as ASGI reads use their own engine
+    pinned = any('serving' in marker.args[0] for marker in metafunc.definition.iter_markers('parametrize'))
+    if 'client' in metafunc.fixturenames and not pinned:
+        metafunc.parametrize('serving', ['wsgi', 'asgi'], indirect=True)
+
+@pytest.fixture
+def serving(request):
+    return getattr(request, 'param', 'wsgi')
 
 @pytest.fixture
-def app():
+def app(serving, tmp_path):
     # Use a separate test database or in-memory sqlite for testing?
     # For now, let's use the same DB but maybe with a different config?
     # Or just mock?
     # Let's use SQLite in-memory for tests to avoid messing with real DB
     class TestConfig:
         SECRET_KEY = 'test_key'
-        SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+        # TEST_DATABASE_URL points the suite (and its query plan checks) at MySQL
+        SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///:memory:'
         SQLALCHEMY_TRACK_MODIFICATIONS = False
         TESTING = True
 
+    if serving == 'asgi' and not os.environ.get('TEST_DATABASE_URL'):
+        # The async engine cannot see another connection's in-memory database
+        TestConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "test.db"}'
+
     app = create_app(TestConfig)
     
     with app.app_context():
         db.create_all()
+        bridge = None
+        if serving == 'asgi':
+            from asgi import AsgiApp
+            # The test client speaks WSGI; route its requests through ASGI
+            bridge = app.wsgi_app = AsgiBridge(AsgiApp(app))
         yield app
+        if bridge is not None:
+            bridge.close()
+        # Write views still held in memory while the tables exist
+        view_counter.flush()
         db.session.remove()
         db.drop_all()
 
@@ -36,3 +65,63 @@ def client(app):
 @pytest.fixture
 def runner(app):
     return app.test_cli_runner()
+
+class AsgiBridge:
+    """WSGI callable that serves requests through an ASGI app.
+
+    The ASGI app runs on an event loop in a background thread, the way a
+    server would run it, so Flask's test client can drive it unchanged.
+    """
+
+    def __init__(self, asgi_app):
+        self.asgi_app = asgi_app
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def __call__(self, environ, start_response):
+        future = asyncio.run_coroutine_threadsafe(self._request(environ), self.loop)
+        status, headers, body = future.result()
+        start_response(status, headers)
+        return [body]
+
+    async def _request(self, environ):
+        scope = {
+            'type': 'http',
+            'http_version': '1.1',
+            'method': environ['REQUEST_METHOD'],
+            'scheme': environ['wsgi.url_scheme'],
+            'path': environ['PATH_INFO'].encode('latin-1').decode('utf-8'),
+            'query_string': environ.get('QUERY_STRING', '').encode('latin-1'),
+            'root_path': '',
+            'server': (environ['SERVER_NAME'], int(environ['SERVER_PORT'])),
+            'client': ('127.0.0.1', 0),
+            'headers': [
+                (key[5:].replace('_', '-').lower().encode('latin-1'), value.encode('latin-1'))
+                for key, value in environ.items() if key.startswith('HTTP_')
+            ] + [
+                (key.replace('_', '-').lower().encode('latin-1'), environ[key].encode('latin-1'))
+                for key in ('CONTENT_TYPE', 'CONTENT_LENGTH') if environ.get(key)
+            ],
+        }
+        body = environ['wsgi.input'].read()
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        await self.asgi_app(scope, receive, send)
+        start = sent[0]
+        headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in start['headers']]
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        return f"{start['status']} -", headers, body
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.asgi_app.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
@@ -0,0 +1,184 @@
+import logging
+
+def _login_admin(client):
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+
+def test_server_timing_header(client):
+    _login_admin(client)
+    client.post('/api/articles', json={'title': 'Hello', 'content': 'Body'})
+
+    response = client.get('/api/articles?status=all')
+    timing = response.headers['Server-Timing']
+    assert 'db;dur=' in timing
+    assert 'serialize;dur=' in timing
+    assert 'total;dur=' in timing
+    assert 'queries"' in timing
+
+def test_metrics_admin_only(client):
+    response = client.get('/api/admin/metrics')
+    assert response.status_code == 401
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/register', json={
+        'username': 'reader',
+        'email': 'reader@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={'username': 'reader', 'password': 'password'})
+    response = client.get('/api/admin/metrics')
+    assert response.status_code == 403
+
+def test_metrics_prometheus_format(client):
+    _login_admin(client)
+    client.get('/api/articles/1')
+    client.get('/api/articles/2')
+
+    response = client.get('/api/admin/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    text = response.get_data(as_text=True)
+    assert '# TYPE blog_request_duration_seconds histogram' in text
+    # Both ids land in one series keyed by the URL rule
+    assert 'blog_requests_total{method="GET",route="/api/articles/<int:id>",status="404"} 2' in text
+    assert 'blog_request_sql_statements_count{method="GET",route="/api/articles/<int:id>"} 2' in text
+    assert 'blog_request_duration_seconds_bucket{method="GET",route="/api/articles/<int:id>",le="+Inf"} 2' in text
+
+def test_slow_request_logged(app, client, caplog):
+    _login_admin(client)
+    app.config['SLOW_REQUEST_MS'] = 0
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        client.get('/api/articles/1')
+    messages = [r.getMessage() for r in caplog.records]
+    assert any(m.startswith('Slow request GET /api/articles/1') and 'SELECT' in m for m in messages)
+
+def test_stats_from_rollups(client, runner):
+    from datetime import datetime
+    _login_admin(client)
+    client.post('/api/articles', json={'title': 'One', 'content': 'Body'})
+    client.post('/api/articles', json={'title': 'Two', 'content': 'Body', 'status': 'draft'})
+    client.post('/api/articles', json={'title': 'Three', 'content': 'Body'})
+    client.put('/api/articles/2', json={'status': 'published'})
+    client.delete('/api/articles/3')
+    client.post('/api/comments', json={'content': 'Approved', 'article_id': 1})
+
+    client.post('/auth/register', json={
+        'username': 'reader',
+        'email': 'reader@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={'username': 'reader', 'password': 'password'})
+    for i in range(3):
+        client.post('/api/comments', json={'content': f'Pending {i}', 'article_id': 1})
+    assert client.get('/api/admin/stats').status_code == 403
+
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+    client.put('/api/comments/2/status', json={'status': 'rejected'})
+    client.delete('/api/comments/3')
+    client.post('/api/comments/bulk', json={'action': 'approve', 'ids': [4]})
+
+    response = client.get('/api/admin/stats')
+    assert response.status_code == 200
+    stats = response.json
+    assert stats['articles'] == {'published': 2}
+    assert stats['comments'] == {'approved': 2, 'rejected': 1}
+    assert stats['pending_comments'] == 0
+    assert len(stats['daily']) == 90
+    today = stats['daily'][-1]
+    assert today == {'date': datetime.utcnow().date().isoformat(), 'articles': 2, 'comments': 3, 'users': 2}
+    assert all(day['articles'] == day['comments'] == day['users'] == 0 for day in stats['daily'][:-1])
+
+    result = runner.invoke(args=['repair-counters'])
+    assert result.exit_code == 0
+    assert client.get('/api/admin/stats').json == stats
+
+def test_export_import_content(client, runner, tmp_path, monkeypatch):
+    import json
+    import search
+    _login_admin(client)
+    client.post('/api/categories', json={'name': 'Tech'})
+    client.post('/api/articles', json={'title': 'Flask tips', 'content': 'Body', 'category_id': 1})
+    client.post('/api/articles', json={'title': 'Second', 'content': 'Body'})
+    client.post('/api/comments', json={'content': 'Approved', 'article_id': 1})
+    client.post('/auth/register', json={'username': 'reader', 'email': 'reader@example.com', 'password': 'password'})
+    client.post('/auth/login', json={'username': 'reader', 'password': 'password'})
+    client.post('/api/comments', json={'content': 'Pending', 'article_id': 2})
+    assert client.get('/api/admin/export').status_code == 403
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+
+    response = client.get('/api/admin/export')
+    assert response.mimetype == 'application/x-ndjson'
+    body = response.get_data()
+    records = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+    assert records[0]['type'] == 'header'
+    assert [r['type'] for r in records[1:]] == ['user', 'user', 'category', 'article', 'article', 'comment', 'comment']
+
+    report = client.post('/api/admin/import?dry_run=1', data=body).json
+    assert report['inserted'] == {'user': 0, 'category': 0, 'article': 2, 'comment': 2}
+    assert report['merged'] == {'user': 2, 'category': 1, 'article': 0, 'comment': 0}
+    assert client.get('/api/articles').json['total'] == 2
+
+    # A failure part way leaves the committed batches; the rerun resumes
+    export = tmp_path / 'blog.ndjson'
+    assert runner.invoke(args=['export-content', str(export)]).exit_code == 0
+    index_rows = search.index_rows
+    def fail_second(rows):
+        monkeypatch.setattr(search, 'index_rows', lambda rows: 1 / 0)
+        index_rows(rows)
+    monkeypatch.setattr(search, 'index_rows', fail_second)
+    result = runner.invoke(args=['import-content', str(export), '--batch-size', '1'])
+    assert result.exit_code == 1
+    assert 'Run it again to resume' in result.output
+    monkeypatch.setattr(search, 'index_rows', index_rows)
+    result = runner.invoke(args=['import-content', str(export), '--batch-size', '1'])
+    assert result.exit_code == 0
+    assert 'Imported 0 users, 0 categories, 1 articles, 2 comments' in result.output
+
+    articles = client.get('/api/articles').json['articles']
+    assert sorted((a['title'], a['category'], a['comment_count']) for a in articles) == [
+        ('Flask tips', 'Tech', 1), ('Flask tips', 'Tech', 1), ('Second', None, 0), ('Second', None, 0)
+    ]
+    assert len(client.get('/api/articles/search?q=flask').json['results']) == 2
+    assert len(client.get('/api/comments?article_id=3').json) == 1
+    stats = client.get('/api/admin/stats').json
+    assert stats['comments'] == {'approved': 2, 'pending': 2}
+    assert runner.invoke(args=['repair-counters']).exit_code == 0
+    assert client.get('/api/admin/stats').json == stats
+    assert client.get('/api/categories').json[0]['article_count'] == 2
+
+    # Everything is in already
+    report = client.post('/api/admin/import', data=export.read_bytes()).json
+    assert sum(report['inserted'].values()) == 0
+    assert report['skipped'] == {'user': 2, 'category': 1, 'article': 2, 'comment': 2}
+    assert client.post('/api/admin/import', data=b'{"type": "article"}\n').status_code == 400
+
+    # Records the database would reject are skipped and reported, the rest go in
+    header = dict(records[0], export_id='bad-records')
+    lines = [
+        header,
+        {'type': 'article', 'id': 1, 'title': 'Kept', 'content': '# Kept'},
+        {'type': 'article', 'id': 1, 'title': 'Same id again', 'content': 'Body'},
+        {'type': 'comment', 'id': 1, 'content': 'x' * 501, 'article_id': 1},
+        {'type': 'comment', 'id': 2, 'content': 'Fits', 'article_id': 1},
+    ]
+    report = client.post('/api/admin/import', data=''.join(json.dumps(line) + '\n' for line in lines)).json
+    assert report['inserted'] == {'user': 0, 'category': 0, 'article': 1, 'comment': 1}
+    assert report['skipped']['article'] == 1
+    assert report['errors'] == ['line 4: comment 1 content is longer than 500 characters']
+    kept = client.get('/api/articles?per_page=1').json['articles'][0]
+    assert kept['title'] == 'Kept'
+    # Imported articles arrive rendered
+    from extensions import db
+    from models import Article
+    assert db.session.get(Article, kept['id']).content_html.startswith('<h1')
@@ -1,3 +1,7 @@
+import json
+import pytest
+from cache import LRUBackend
+
 def test_create_article(client):
     # Login as admin (first user is admin)
     client.post('/auth/register', json={
@@ -24,6 +28,19 @@ def test_get_articles(client):
     assert response.status_code == 200
     assert b'articles' in response.data
 
+def test_get_articles_per_page_capped(app, client):
+    from sqlalchemy import insert
+    from extensions import db
+    from models import Article
+
+    db.session.execute(insert(Article), [
+        {'title': f'Article {i}', 'content': 'Content', 'status': 'published'} for i in range(105)
+    ])
+    db.session.commit()
+    response = client.get('/api/articles?per_page=1000')
+    assert len(response.json['articles']) == 100
+    assert response.json['pages'] == 2
+
 def test_update_article(client):
     # Register and login as admin
     client.post('/auth/register', json={
@@ -73,3 +90,384 @@ def test_delete_article(client):
 
     response = client.delete('/api/articles/1')
     assert response.status_code == 200
+
+@pytest.mark.parametrize('serving', ['wsgi'], indirect=True)
+def test_get_articles_query_count_constant(app, client):
+    from sqlalchemy import event
+    from extensions import db
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/categories', json={'name': 'Tech'})
+    for i in range(20):
+        client.post('/api/articles', json={
+            'title': f'Article {i}',
+            'content': 'Content',
+            'category_id': 1,
+            'status': 'published'
+        })
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client.get('/api/articles')
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        client.get('/api/articles?per_page=2')
+        small = len(statements)
+        statements.clear()
+        response = client.get('/api/articles?per_page=20')
+        large = len(statements)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    assert len(response.json['articles']) == 20
+    assert response.json['articles'][0]['author'] == 'admin'
+    assert response.json['articles'][0]['category'] == 'Tech'
+    assert small == large
+
+@pytest.mark.parametrize('serving', ['wsgi'], indirect=True)
+def test_listing_etags_without_table_scans(client):
+    from sqlalchemy import event
+    from extensions import db
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    for i in range(3):
+        client.post('/api/articles', json={'title': f'Article {i}', 'content': 'Content', 'status': 'published'})
+        client.post('/api/comments', json={'content': f'Comment {i}', 'article_id': 1})
+    client.post('/auth/logout')
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Cursor pages never count the table, not even to build their ETag
+    for url in ['/api/articles?limit=2', '/api/comments?limit=2']:
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            response = client.get(url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        assert not any('count(' in statement.lower() for statement in statements), url
+        statements.clear()
+        assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def test_get_articles_cursor(client):
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    for i in range(5):
+        client.post('/api/articles', json={
+            'title': f'Article {i}',
+            'content': 'Content',
+            'status': 'published'
+        })
+
+    seen = []
+    response = client.get('/api/articles?limit=2')
+    while True:
+        assert response.status_code == 200
+        assert 'total' not in response.json
+        seen.extend(a['id'] for a in response.json['articles'])
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            break
+        response = client.get(f'/api/articles?limit=2&cursor={cursor}')
+
+    assert seen == [5, 4, 3, 2, 1]
+
+    response = client.get('/api/articles?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+def test_get_article_html(app, client, runner):
+    from extensions import db
+    from models import Article
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/articles', json={
+        'title': 'Markdown',
+        'content': '# Intro\n\nHello <script>alert(1)</script>\n\n## 安装\n\nText',
+        'status': 'published'
+    })
+
+    response = client.get('/api/articles/1?format=html')
+    assert 'content' not in response.json
+    assert '<h1 id="intro">Intro</h1>' in response.json['html']
+    assert '<script>' not in response.json['html']
+    assert response.json['toc'] == [
+        {'text': 'Intro', 'depth': 1, 'slug': 'intro'},
+        {'text': '安装', 'depth': 2, 'slug': '安装'}
+    ]
+
+    # Unchanged content is not re-rendered on update
+    article = db.session.get(Article, 1)
+    rendered_hash = article.content_hash
+    client.put('/api/articles/1', json={'title': 'Renamed'})
+    db.session.expire_all()
+    assert db.session.get(Article, 1).content_hash == rendered_hash
+
+    # Backfill renders rows saved before rendering existed
+    Article.query.update({'content_html': None, 'toc': None, 'content_hash': None})
+    db.session.commit()
+    result = runner.invoke(args=['render-articles', '--workers', '1'])
+    assert 'Rendered 1 articles.' in result.output
+    db.session.expire_all()
+    assert db.session.get(Article, 1).content_hash == rendered_hash
+
+def test_get_article_conditional(client):
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/articles', json={
+        'title': 'Cached',
+        'content': 'Content',
+        'status': 'published'
+    })
+
+    for url in ['/api/articles', '/api/articles/1']:
+        response = client.get(url)
+        etag = response.headers['ETag']
+
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+    # Listings change on deletes without a newer updated_at, so only the
+    # single article carries Last-Modified
+    assert 'Last-Modified' not in client.get('/api/articles').headers
+    last_modified = client.get('/api/articles/1').headers['Last-Modified']
+    response = client.get('/api/articles/1', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+    # Any write changes the validators
+    client.put('/api/articles/1', json={'status': 'draft'})
+    response = client.get('/api/articles/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    # Drafts stay hidden from revalidating visitors
+    client.post('/auth/logout')
+    response = client.get('/api/articles/1', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 403
+
+    # Missing articles still 404
+    assert client.get('/api/articles/99').status_code == 404
+
+def test_export_static(client, runner, tmp_path):
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/categories', json={'name': 'Tech'})
+    for i in range(3):
+        client.post('/api/articles', json={
+            'title': f'Article {i}',
+            'content': f'# Part {i}',
+            'category_id': 1,
+            'status': 'published'
+        })
+    client.post('/api/articles', json={'title': 'Draft', 'content': 'Draft', 'status': 'draft'})
+
+    result = runner.invoke(args=['export-static', str(tmp_path), '--workers', '0', '--per-page', '2'])
+    assert 'Exported 3 articles, removed 0' in result.output
+    assert '<h1 id="part-1">Part 1</h1>' in (tmp_path / 'articles/2.html').read_text()
+    assert not (tmp_path / 'articles/4.html').exists()
+    assert (tmp_path / 'page/2.html').exists()
+    assert (tmp_path / 'categories/1/index.html').exists()
+    page = json.loads((tmp_path / 'api/articles/page/1.json').read_text())
+    assert [a['id'] for a in page['articles']] == [3, 2]
+    assert page['pages'] == 2
+    page = json.loads((tmp_path / 'api/categories/1/page/2.json').read_text())
+    assert [a['id'] for a in page['articles']] == [1]
+    assert (page['total'], page['pages']) == (3, 2)
+
+    # Nothing changed, nothing is redone
+    result = runner.invoke(args=['export-static', str(tmp_path), '--workers', '0', '--per-page', '2'])
+    assert 'Exported 0 articles, removed 0, wrote 0 listing files' in result.output
+
+    client.put('/api/articles/1', json={'title': 'Edited'})
+    client.put('/api/articles/2', json={'status': 'draft'})
+    result = runner.invoke(args=['export-static', str(tmp_path), '--workers', '0', '--per-page', '2'])
+    assert 'Exported 1 articles, removed 1' in result.output
+    assert 'Edited' in (tmp_path / 'articles/1.html').read_text()
+    assert not (tmp_path / 'articles/2.html').exists()
+    assert not (tmp_path / 'page/2.html').exists()
+
+def test_get_articles_fragments(app, client):
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/categories', json={'name': 'Tech'})
+    for i in range(3):
+        client.post('/api/articles', json={
+            'title': f'文章 {i} "quoted"',
+            'content': 'Content',
+            'category_id': 1,
+            'status': 'published'
+        })
+
+    # Distinct query strings keep the response cache out of the way
+    spliced = client.get('/api/articles?per_page=2').get_data()
+    assert client.get('/api/articles?per_page=2&a=1').get_data() == spliced
+    app.extensions['fragment_cache'] = None
+    assert client.get('/api/articles?per_page=2&b=1').get_data() == spliced
+    app.extensions['fragment_cache'] = LRUBackend(100, ttl=0)
+
+    # A rename and a new comment count reach cached summaries
+    client.get('/api/articles')
+    client.put('/api/categories/1', json={'name': 'Technology'})
+    client.post('/api/comments', json={'content': 'Hi', 'article_id': 3})
+    articles = client.get('/api/articles').json['articles']
+    assert {a['category'] for a in articles} == {'Technology'}
+    assert articles[0]['comment_count'] == 1
+
+def test_view_counting_and_trending(app, client, monkeypatch):
+    from types import SimpleNamespace
+    import view_counter as views
+    from view_counter import view_counter
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+    for title in ('Old', 'Steady', 'Fresh'):
+        client.post('/api/articles', json={'title': title, 'content': 'Body'})
+    client.post('/api/articles', json={'title': 'Hidden', 'content': 'Body', 'status': 'draft'})
+
+    def view(id, times):
+        for _ in range(times):
+            # Cache hits and revalidations count too
+            assert client.get(f'/api/articles/{id}').status_code == 200
+
+    def flush_at(timestamp):
+        monkeypatch.setattr(views, 'time', SimpleNamespace(time=lambda: timestamp))
+        with app.app_context():
+            view_counter.flush()
+
+    assert client.get('/api/articles/trending').json == {'articles': []}
+    updated_at = client.get('/api/articles/1').json['updated_at']
+
+    # Three days ago "Old" was popular; today the others get a few views
+    now = views.time.time()
+    view(1, 7)
+    view(2, 1)
+    view(4, 5)
+    client.get('/api/articles/99')
+    assert view_counter.pending() == {1: 8, 2: 1, 4: 5}
+    flush_at(now - 3 * 24 * 3600)
+    assert view_counter.pending() == {}
+
+    view(2, 2)
+    view(3, 2)
+    flush_at(now)
+
+    articles = client.get('/api/articles/trending').json['articles']
+    # 8 views three half-lives ago are worth 1; drafts never trend
+    assert [(a['title'], a['views']) for a in articles] == [('Steady', 3), ('Fresh', 2), ('Old', 8)]
+    assert abs(articles[0]['trending_score'] - 2.125) < 0.05
+    assert abs(articles[2]['trending_score'] - 1) < 0.05
+    assert client.get('/api/articles/trending?limit=1').json['articles'][0]['title'] == 'Steady'
+    # Being read is not an edit
+    assert client.get('/api/articles/1').json['updated_at'] == updated_at
+
+def test_article_revisions(client):
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+
+    lines = [f'Line {i} of a long post.\n' for i in range(200)]
+    versions = [''.join(lines)]
+    client.post('/api/articles', json={'title': 'Draft', 'content': versions[0]})
+    for edit in range(12):
+        lines[edit * 7] = f'Edited line {edit * 7}.\n'
+        versions.append(''.join(lines))
+        client.put('/api/articles/1', json={'content': versions[-1], 'title': f'Edit {edit}'})
+    # Only text changes are revisions
+    client.put('/api/articles/1', json={'status': 'draft'})
+
+    history = client.get('/api/articles/1/revisions').json
+    assert [r['number'] for r in history] == list(range(13, 0, -1))
+    assert [r['number'] for r in history if r['snapshot']] == [11, 1]
+    assert history[0]['author'] == 'admin'
+    # Single-line deltas are a fraction of a full snapshot
+    assert max(r['size'] for r in history if not r['snapshot']) * 5 < history[-1]['size']
+
+    for number, content in enumerate(versions, 1):
+        revision = client.get(f'/api/articles/1/revisions/{number}').json
+        assert revision['content'] == content
+        assert revision['title'] == ('Draft' if number == 1 else f'Edit {number - 2}')
+    assert client.get('/api/articles/1/revisions/14').status_code == 404
+
+    diff = client.get('/api/articles/1/revisions/diff?from=2&to=4').json
+    assert diff['title'] == {'from': 'Edit 0', 'to': 'Edit 2'}
+    assert '-Line 7 of a long post.\n+Edited line 7.\n' in diff['content']
+    assert '+Edited line 14.\n' in diff['content']
+    assert 'Line 0' not in diff['content']
+
+    response = client.post('/api/articles/1/revisions/3/restore')
+    assert response.status_code == 200
+    assert response.json['revision'] == 14
+    article = client.get('/api/articles/1').json
+    assert (article['title'], article['content']) == ('Edit 1', versions[2])
+    assert client.get('/api/articles/1/revisions/14').json['content'] == versions[2]
+
+    client.post('/auth/register', json={
+        'username': 'reader',
+        'email': 'reader@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={'username': 'reader', 'password': 'password'})
+    assert client.get('/api/articles/1/revisions').status_code == 403
+    assert client.get('/api/articles/1/revisions/1').status_code == 403
@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import event
+from extensions import db
+
+@pytest.mark.parametrize('serving', ['asgi'], indirect=True)
+def test_public_reads_use_async_engine(app):
+    client = app.test_client()
+    asgi_app = app.wsgi_app.asgi_app
+    engines = []
+    def on_sync(*args):
+        engines.append('sync')
+    def on_async(*args):
+        engines.append('async')
+    event.listen(db.engine, 'before_cursor_execute', on_sync)
+    event.listen(asgi_app.engines[None].sync_engine, 'before_cursor_execute', on_async)
+    try:
+        client.post('/auth/register', json={
+            'username': 'admin',
+            'email': 'admin@example.com',
+            'password': 'password'
+        })
+        client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+        response = client.post('/api/articles', json={'title': 'Hello', 'content': 'Body'})
+        assert response.status_code == 201
+        assert set(engines) == {'sync'}
+
+        engines.clear()
+        response = client.get('/api/articles/1')
+        assert response.json['title'] == 'Hello'
+        assert 'queries"' in response.headers['Server-Timing']
+        assert set(engines) == {'async'}
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', on_sync)
+        event.remove(asgi_app.engines[None].sync_engine, 'before_cursor_execute', on_async)
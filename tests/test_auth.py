@@ -1,3 +1,4 @@
+import pytest
 def test_register(client):
     response = client.post('/auth/register', json={
         'username': 'testuser',
@@ -29,3 +30,88 @@ def test_login_invalid(client):
         'password': 'wrongpassword'
     })
     assert response.status_code == 401
+
+def test_login_rehashes_old_password_hash(app, client):
+    from werkzeug.security import generate_password_hash
+    from extensions import db
+    from models import User
+
+    user = User(username='legacy', email='legacy@example.com',
+                password_hash=generate_password_hash('password123', 'pbkdf2:sha256:1000'))
+    db.session.add(user)
+    db.session.commit()
+
+    response = client.post('/auth/login', json={'username': 'legacy', 'password': 'password123'})
+    assert response.status_code == 200
+    db.session.refresh(user)
+    assert user.password_hash.startswith(app.config['PASSWORD_HASH_METHOD'] + '$')
+
+    client.post('/auth/logout')
+    response = client.post('/auth/login', json={'username': 'legacy', 'password': 'password123'})
+    assert response.status_code == 200
+
+def test_login_rejected_when_hasher_saturated(app, client):
+    client.post('/auth/register', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+
+    slots = app.extensions['password_hasher']['slots']
+    taken = 0
+    while slots.acquire(blocking=False):
+        taken += 1
+    try:
+        response = client.post('/auth/login', json={'username': 'testuser', 'password': 'password123'})
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '1'
+        # Reads do not wait on the hasher
+        assert client.get('/api/articles').status_code == 200
+    finally:
+        for _ in range(taken):
+            slots.release()
+
+    response = client.post('/auth/login', json={'username': 'testuser', 'password': 'password123'})
+    assert response.status_code == 200
+
+@pytest.mark.parametrize('serving', ['wsgi'], indirect=True)
+def test_principal_cache(app, client):
+    from flask import g
+    from sqlalchemy import event
+    from extensions import db, principal_cache
+    from models import User
+
+    client.post('/auth/register', json={
+        'username': 'testuser',
+        'email': 'test@example.com',
+        'password': 'password123'
+    })
+    client.post('/auth/login', json={'username': 'testuser', 'password': 'password123'})
+    assert client.get('/auth/me').json['is_admin'] is True
+
+    # The fixture's app context outlives requests; drop the user Flask-Login
+    # memoised in g so each request loads it like in production
+    def get_me():
+        g.pop('_login_user', None)
+        return client.get('/auth/me')
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        response = get_me()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    assert response.json['username'] == 'testuser'
+    assert statements == []
+    assert principal_cache.stats()['hits'] >= 1
+
+    # A committed change to the user evicts the cached principal
+    user = User.query.filter_by(username='testuser').first()
+    user.is_admin = False
+    db.session.commit()
+    misses = principal_cache.stats()['misses']
+    assert get_me().json['is_admin'] is False
+    assert principal_cache.stats()['misses'] == misses + 1
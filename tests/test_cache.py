@@ -0,0 +1,148 @@
+import threading
+import time
+import pytest
+from cache import LRUBackend, RedisBackend, SingleFlight
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+def test_lru_backend_limits():
+    backend = LRUBackend(max_entries=2, ttl=0.05)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.get('a')
+    backend.set('c', 3)
+    # 'b' was least recently used
+    assert backend.get('b') is None
+    assert backend.get('a') == 1
+
+    time.sleep(0.06)
+    assert backend.get('a') is None
+    backend.set('d', 4, ttl=0)
+    time.sleep(0.06)
+    assert backend.get('d') == 4
+
+def test_redis_backend_round_trip():
+    client = FakeRedis()
+    backend = RedisBackend(client)
+    backend.set('key', {'body': b'{}'})
+    assert backend.get('key') == {'body': b'{}'}
+    assert 'blog:key' in client.data
+    backend.delete('key')
+    assert backend.get('key') is None
+
+def test_single_flight():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'value'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', slow)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', slow))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    release.set()
+    for t in [leader] + followers:
+        t.join()
+
+    assert results == ['value'] * 4
+    assert len(calls) == 1
+
+@pytest.mark.parametrize('serving', ['wsgi'], indirect=True)
+def test_response_cache(app, client):
+    from sqlalchemy import event
+    from extensions import db
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/settings', json={'site_title': 'My Blog'})
+    client.post('/auth/logout')
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client.get('/api/settings')
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        response = client.get('/api/settings')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    assert response.json == {'site_title': 'My Blog'}
+    assert statements == []
+
+    # Cached ETags still revalidate
+    response = client.get('/api/settings', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+    # A write drops the cached copy
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/settings', json={'site_title': 'Renamed'})
+    client.post('/auth/logout')
+    assert client.get('/api/settings').json == {'site_title': 'Renamed'}
+
+def test_compressed_responses(app, client, monkeypatch):
+    import gzip
+    from compression import compressor
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/articles', json={'title': 'Long', 'content': 'Lorem ipsum ' * 200})
+    client.post('/auth/logout')
+
+    identity = client.get('/api/articles/1')
+    assert 'Content-Encoding' not in identity.headers
+    assert 'Accept-Encoding' in identity.headers['Vary']
+
+    compressions = []
+    compress = compressor.compress
+    monkeypatch.setattr(compressor, 'compress', lambda data, encoding: compressions.append(encoding) or compress(data, encoding))
+    response = client.get('/api/articles/1', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == identity.get_data()
+    assert response.headers['ETag'].startswith('W/')
+    # The cache entry was compressed when it was filled, not per hit
+    assert compressions == []
+
+    response = client.get('/api/articles/1', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+    # Small bodies are not worth it
+    response = client.get('/api/categories', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
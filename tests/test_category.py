@@ -69,3 +69,62 @@ def test_delete_category(client):
 
     response = client.delete('/api/categories/1')
     assert response.status_code == 200
+
+def test_category_article_counts(app, client, runner):
+    from extensions import db
+    from models import CategoryArticleCount
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/categories', json={'name': 'Tech'})
+    client.post('/api/categories', json={'name': 'Life'})
+    for status in ['published', 'published', 'draft']:
+        client.post('/api/articles', json={
+            'title': 'Article',
+            'content': 'Content',
+            'category_id': 1,
+            'status': status
+        })
+
+    response = client.get('/api/categories')
+    assert response.json[0]['article_count'] == 3
+    assert response.json[0]['article_counts'] == {'published': 2, 'draft': 1}
+
+    # Move one article to another category, delete another
+    client.put('/api/articles/1', json={'category_id': 2})
+    client.delete('/api/articles/3')
+    response = client.get('/api/categories')
+    assert [c['article_count'] for c in response.json] == [1, 1]
+
+    # Public readers only see published counts
+    client.post('/api/articles', json={
+        'title': 'Draft',
+        'content': 'Content',
+        'category_id': 1,
+        'status': 'draft'
+    })
+    client.post('/auth/logout')
+    response = client.get('/api/categories')
+    assert [c['article_count'] for c in response.json] == [1, 1]
+    assert 'article_counts' not in response.json[0]
+
+    # Repair recomputes from the article table
+    CategoryArticleCount.query.delete()
+    db.session.commit()
+    result = runner.invoke(args=['repair-counters'])
+    assert result.exit_code == 0
+    response = client.get('/api/categories')
+    assert [c['article_count'] for c in response.json] == [1, 1]
+
+    # A decrement never creates a bucket, which would hold a negative count
+    from counters import adjust_category_count
+    adjust_category_count(2, 'private', -1)
+    db.session.commit()
+    assert CategoryArticleCount.query.filter_by(status='private').count() == 0
@@ -1,3 +1,5 @@
+import pytest
+
 def test_create_comment(client):
     # Register admin first (so it gets is_admin=True)
     client.post('/auth/register', json={
@@ -104,3 +106,260 @@ def test_delete_comment(client):
 
     response = client.delete('/api/comments/1')
     assert response.status_code == 200
+
+def test_get_comments_cursor(client):
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/articles', json={
+        'title': 'Article',
+        'content': 'Content',
+        'status': 'published'
+    })
+    for i in range(3):
+        client.post('/api/comments', json={
+            'content': f'Comment {i}',
+            'article_id': 1
+        })
+
+    response = client.get('/api/comments?article_id=1&limit=2')
+    assert [c['id'] for c in response.json['comments']] == [3, 2]
+
+    cursor = response.json['next_cursor']
+    response = client.get(f'/api/comments?article_id=1&limit=2&cursor={cursor}')
+    assert [c['id'] for c in response.json['comments']] == [1]
+    assert response.json['next_cursor'] is None
+
+@pytest.mark.parametrize('serving', ['wsgi'], indirect=True)
+def test_get_comments_query_count_constant(client):
+    from sqlalchemy import event
+    from extensions import db
+
+    for name in ['admin', 'alice', 'bob', 'carol']:
+        client.post('/auth/register', json={
+            'username': name,
+            'email': f'{name}@example.com',
+            'password': 'password'
+        })
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+    for title in ['Quiet', 'Busy']:
+        client.post('/api/articles', json={'title': title, 'content': 'Content', 'status': 'published'})
+    client.post('/api/comments', json={'content': 'Only one', 'article_id': 1})
+    for name in ['alice', 'bob', 'carol']:
+        client.post('/auth/login', json={'username': name, 'password': 'password'})
+        client.post('/api/comments', json={'content': f'From {name}', 'article_id': 2})
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Authors are joined in, not loaded one by one
+    client.get('/auth/me')
+    for suffix in ['', '&limit=10']:
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            client.get(f'/api/comments?article_id=1{suffix}')
+            quiet = len(statements)
+            statements.clear()
+            response = client.get(f'/api/comments?article_id=2{suffix}')
+            busy = len(statements)
+            statements.clear()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        comments = response.json['comments'] if suffix else response.json
+        assert sorted(c['author'] for c in comments) == ['alice', 'bob', 'carol']
+        assert quiet == busy
+
+def test_article_listing_comment_counts(app, client, runner):
+    from extensions import db
+    from models import Article
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/register', json={
+        'username': 'user',
+        'email': 'user@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+    client.post('/api/articles', json={'title': 'First', 'content': 'Content'})
+    client.post('/api/articles', json={'title': 'Second', 'content': 'Content'})
+    updated_at = client.get('/api/articles/1').json['updated_at']
+
+    # Admin comments are approved straight away, the user's wait in the queue
+    client.post('/api/comments', json={'content': 'By admin', 'article_id': 1})
+    client.post('/auth/login', json={'username': 'user', 'password': 'password'})
+    client.post('/api/comments', json={'content': 'Pending', 'article_id': 1})
+    client.post('/api/comments', json={'content': 'Also pending', 'article_id': 2})
+
+    def counts():
+        return {a['title']: a['comment_count'] for a in client.get('/api/articles').json['articles']}
+
+    response = client.get('/api/articles')
+    etag = response.headers['ETag']
+    assert counts() == {'First': 1, 'Second': 0}
+
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+    client.put('/api/comments/2/status', json={'status': 'approved'})
+    client.put('/api/comments/3/status', json={'status': 'approved'})
+    client.put('/api/comments/3/status', json={'status': 'rejected'})
+    assert counts() == {'First': 2, 'Second': 0}
+    assert client.get('/api/articles', headers={'If-None-Match': etag}).status_code == 200
+
+    client.delete('/api/comments/1')
+    assert counts() == {'First': 1, 'Second': 0}
+    # Comments do not count as edits of the article
+    assert client.get('/api/articles/1').json['updated_at'] == updated_at
+
+    db.session.execute(db.update(Article).values(comment_count=7))
+    db.session.commit()
+    result = runner.invoke(args=['repair-counters'])
+    assert result.exit_code == 0
+    # Any article write drops the cached listing
+    client.put('/api/articles/2', json={'summary': 'Edited'})
+    assert counts() == {'First': 1, 'Second': 0}
+
+def test_bulk_moderation(app, client):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from extensions import db
+    from models import Comment
+    import routes.comment
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+    client.post('/api/articles', json={'title': 'First', 'content': 'Content'})
+    client.post('/api/articles', json={'title': 'Second', 'content': 'Content'})
+
+    now = datetime.utcnow()
+    db.session.execute(insert(Comment), [
+        {'id': i, 'content': f'Spam {i}', 'article_id': 1 if i <= 30 else 2, 'user_id': 1,
+         'status': 'pending', 'created_at': now - timedelta(days=i), 'updated_at': now}
+        for i in range(1, 41)
+    ])
+    db.session.commit()
+
+    def counts():
+        return {a['title']: a['comment_count'] for a in client.get('/api/articles').json['articles']}
+
+    # Small chunks so every path runs over several transactions
+    routes.comment.BULK_CHUNK_SIZE = 7
+    try:
+        response = client.post('/api/comments/bulk', json={'action': 'approve', 'ids': [1, 2, 3, 3, 35, 999]})
+        assert response.json['matched'] == 4
+        assert response.json['affected'] == 4
+        assert counts() == {'First': 3, 'Second': 1}
+
+        # Pending comments on article 1 older than 10 days
+        before = (now - timedelta(days=10, hours=1)).isoformat()
+        response = client.post('/api/comments/bulk', json={
+            'action': 'delete',
+            'filter': {'status': 'pending', 'article_id': 1, 'before': before}
+        })
+        assert response.json['affected'] == 20
+        assert Comment.query.filter_by(article_id=1).count() == 10
+
+        response = client.post('/api/comments/bulk', json={'action': 'reject', 'filter': {'article_id': 1}})
+        assert response.json['matched'] == 10
+        assert counts() == {'First': 0, 'Second': 1}
+        assert client.get('/api/comments?article_id=1&status=approved').json == []
+    finally:
+        routes.comment.BULK_CHUNK_SIZE = 500
+
+    assert client.post('/api/comments/bulk', json={'action': 'approve', 'filter': {}}).status_code == 400
+    assert client.post('/api/comments/bulk', json={'action': 'nuke', 'ids': [1]}).status_code == 400
+    assert client.post('/api/comments/bulk', json={'action': 'delete'}).status_code == 400
+    for spec in [{'article_id': [1]}, {'article_id': '1'}, {'status': ['pending']}, {'status': 'spam'}]:
+        assert client.post('/api/comments/bulk', json={'action': 'approve', 'filter': spec}).status_code == 400
+
+def test_queued_comment_ingestion(app, client):
+    from models import Comment
+    from comment_queue import comment_ingestor
+
+    # Large enough that the writer thread leaves the batch to drain()
+    app.config.update(COMMENT_INGEST_MODE='queued', COMMENT_BATCH_SIZE=1000, COMMENT_BATCH_MAX_AGE=3600)
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/register', json={
+        'username': 'user',
+        'email': 'user@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+    client.post('/api/articles', json={'title': 'Popular', 'content': 'Content'})
+    response = client.post('/api/comments', json={'content': 'First!', 'article_id': 1})
+    assert response.status_code == 202
+    assert response.json['status'] == 'approved'
+
+    client.post('/auth/login', json={'username': 'user', 'password': 'password'})
+    for i in range(5):
+        response = client.post('/api/comments', json={'content': f'Reply {i}', 'article_id': 1})
+        assert response.status_code == 202
+        assert response.json['pending_id']
+    assert client.post('/api/comments', json={'content': 'Lost', 'article_id': 99}).status_code == 404
+    assert client.get('/api/comments/queued').status_code == 403
+
+    # Admins see what is waiting before it reaches the table
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+    queued = client.get('/api/comments/queued').json
+    assert [c['content'] for c in queued] == ['First!'] + [f'Reply {i}' for i in range(5)]
+    assert queued[1]['author'] == 'user'
+    assert Comment.query.count() == 0
+
+    comment_ingestor.drain()
+    assert client.get('/api/comments/queued').json == []
+    assert Comment.query.count() == 6
+    assert Comment.query.filter_by(status='pending').count() == 5
+    assert client.get('/api/articles').json['articles'][0]['comment_count'] == 1
+    assert len(client.get('/api/comments?status=pending').json) == 5
+
+def test_get_comments_streamed(client, monkeypatch):
+    import routes.comment
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/articles', json={
+        'title': 'Article',
+        'content': 'Content',
+        'status': 'published'
+    })
+    for i in range(5):
+        client.post('/api/comments', json={
+            'content': f'评论 {i}',
+            'article_id': 1
+        })
+
+    # Batches of two exercise the joins between streamed chunks
+    monkeypatch.setattr(routes.comment, 'STREAM_BATCH_SIZE', 2)
+    streamed = client.get('/api/comments?status=approved')
+    assert 'Content-Length' not in streamed.headers
+    buffered = client.get('/api/comments?article_id=1&status=approved')
+    assert streamed.get_data() == buffered.get_data()
+    assert [c['id'] for c in streamed.json] == [5, 4, 3, 2, 1]
+
+    assert client.get('/api/comments?status=rejected').json == []
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event, insert, text
+from werkzeug.security import generate_password_hash
+from extensions import db
+from models import Article, Category, Comment, Setting, User
+from counters import rebuild_category_counts
+import search
+
+# Lookup tables that stay small; reading them whole is the plan
+SMALL_TABLES = {'category', 'setting', 'category_article_count', 'search_document'}
+
+# Public routes the hot paths go through, plus the admin views
+PUBLIC_ROUTES = [
+    '/api/articles',
+    '/api/articles?page=3',
+    '/api/articles?limit=10',
+    '/api/articles/5',
+    '/api/articles/5?format=html',
+    '/api/articles/trending',
+    '/api/categories',
+    '/api/comments?article_id=5',
+    '/api/comments?article_id=5&limit=10',
+    '/api/comments',
+    '/api/settings',
+    '/api/articles/search?q=flask',
+]
+ADMIN_ROUTES = [
+    '/api/articles?status=draft',
+    '/api/comments?status=pending',
+]
+
+# Ranking sorts the matched postings by score, which no index can provide
+SORT_ALLOWED = {'/api/articles/search?q=flask'}
+
+@pytest.fixture
+def seeded(app):
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [
+        {'id': 1, 'username': 'admin', 'email': 'admin@example.com',
+         'password_hash': generate_password_hash('password'), 'is_admin': True},
+        {'id': 2, 'username': 'reader', 'email': 'reader@example.com',
+         'password_hash': generate_password_hash('password'), 'is_admin': False},
+    ])
+    db.session.execute(insert(Category), [
+        {'id': i, 'name': f'Category {i}', 'updated_at': now} for i in range(1, 6)
+    ])
+    db.session.execute(insert(Article), [
+        {'id': i, 'title': f'Article {i}', 'summary': 'Summary', 'content': f'Flask post {i}',
+         'status': 'draft' if i % 10 == 0 else 'published', 'category_id': i % 5 + 1, 'user_id': 1,
+         'created_at': now - timedelta(hours=i), 'updated_at': now - timedelta(hours=i)}
+        for i in range(1, 301)
+    ])
+    db.session.execute(insert(Comment), [
+        {'id': i, 'content': f'Comment {i}', 'article_id': i % 300 + 1, 'user_id': 2,
+         'status': ('approved', 'pending', 'rejected')[i % 3],
+         'created_at': now - timedelta(minutes=i), 'updated_at': now - timedelta(minutes=i)}
+        for i in range(1, 3001)
+    ])
+    db.session.execute(insert(Setting), [{'key': 'site_title', 'value': 'Blog', 'updated_at': now}])
+    db.session.commit()
+    search.rebuild()
+    rebuild_category_counts()
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+def _explain(statement, parameters):
+    """EXPLAIN one captured statement and describe any full scan or sort."""
+    cursor = db.session.connection().connection.cursor()
+    problems = []
+
+    if db.engine.dialect.name == 'sqlite':
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        for row in cursor.fetchall():
+            detail = row[-1]
+            words = detail.split()
+            # "SCAN article" reads the table; "SCAN article USING INDEX" walks an index
+            if words[:1] == ['SCAN'] and len(words) == 2 and words[1] not in SMALL_TABLES:
+                problems.append(detail)
+            if 'USE TEMP B-TREE FOR ORDER BY' in detail:
+                problems.append(detail)
+    else:
+        # MySQL: type ALL is a table scan, "Using filesort" a sort
+        cursor.execute('EXPLAIN ' + statement, parameters)
+        columns = [c[0] for c in cursor.description]
+        for values in cursor.fetchall():
+            row = dict(zip(columns, values))
+            if row['type'] == 'ALL' and row['table'] not in SMALL_TABLES:
+                problems.append(f"full scan of {row['table']}")
+            if 'Using filesort' in (row.get('Extra') or ''):
+                problems.append(f"filesort on {row['table']}")
+    return problems
+
+def _capture(client, url):
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+        # Streamed bodies run their queries as they are read
+        response.get_data()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 200, url
+    return statements
+
+def _explain_all(client, routes):
+    failures = {}
+    for url in routes:
+        for statement, parameters in _capture(client, url):
+            problems = [
+                p for p in _explain(statement, parameters)
+                if not (url in SORT_ALLOWED and ('B-TREE' in p or 'filesort' in p))
+            ]
+            if problems:
+                failures.setdefault(url, []).append((statement, problems))
+    return failures
+
+@pytest.mark.parametrize('serving', ['wsgi'], indirect=True)
+def test_public_query_plans(seeded, client):
+    assert _explain_all(client, PUBLIC_ROUTES) == {}
+    # The full comment list is streamed from a server-side cursor
+    assert any('FROM comment' in statement and 'JOIN user' in statement
+               for statement, _ in _capture(client, '/api/comments'))
+
+@pytest.mark.parametrize('serving', ['wsgi'], indirect=True)
+def test_admin_query_plans(seeded, client):
+    client.post('/auth/login', json={'username': 'admin', 'password': 'password'})
+    assert _explain_all(client, ADMIN_ROUTES) == {}
@@ -0,0 +1,58 @@
+from search import tokenize
+
+def test_tokenize():
+    assert tokenize('Flask 入门') == ['flask', '入门']
+    assert tokenize('数据库索引') == ['数据', '据库', '库索', '索引']
+    assert tokenize('用Ｐｙｔｈｏｎ写') == ['用', 'python', '写']
+
+def test_search_articles(client, runner):
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/articles', json={
+        'title': 'MySQL 数据库索引',
+        'content': '本文介绍数据库索引的原理。',
+        'status': 'published'
+    })
+    client.post('/api/articles', json={
+        'title': 'Flask tips',
+        'content': 'Use a database index for hot queries.',
+        'status': 'published'
+    })
+    client.post('/api/articles', json={
+        'title': '草稿：数据库',
+        'content': '还没写完',
+        'status': 'draft'
+    })
+
+    response = client.get('/api/articles/search?q=数据库')
+    results = {r['id']: r for r in response.json['results']}
+    assert set(results) == {1, 3}
+    response = client.get('/api/articles/search?q=数据库&status=draft')
+    assert [r['id'] for r in response.json['results']] == [3]
+    assert '<mark>数据库</mark>' in results[1]['snippet']
+
+    response = client.get('/api/articles/search?q=INDEX')
+    assert [r['id'] for r in response.json['results']] == [2]
+    assert '<mark>index</mark>' in response.json['results'][0]['snippet']
+
+    # The index follows edits and deletes
+    client.put('/api/articles/2', json={'content': 'Nothing to see'})
+    assert client.get('/api/articles/search?q=index').json['results'] == []
+    client.delete('/api/articles/1')
+    assert [r['id'] for r in client.get('/api/articles/search?q=数据库').json['results']] == [3]
+
+    # Readers only find published articles
+    client.post('/auth/logout')
+    assert client.get('/api/articles/search?q=数据库').json['results'] == []
+    assert client.get('/api/articles/search?q=数据库&status=draft').json['results'] == []
+    assert client.get('/api/articles/search').status_code == 400
+
+    result = runner.invoke(args=['reindex-search'])
+    assert 'Indexed 2 articles.' in result.output
@@ -1,3 +1,4 @@
+import pytest
 def test_get_settings(client):
     response = client.get('/api/settings')
     assert response.status_code == 200
@@ -25,3 +26,84 @@ def test_update_settings(client):
     response = client.get('/api/settings')
     assert response.json['site_title'] == 'My Blog'
     assert response.json['allow_comments'] == 'true'
+
+def test_get_settings_conditional(client):
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/settings', json={'site_title': 'My Blog'})
+
+    response = client.get('/api/settings')
+    etag = response.headers['ETag']
+    response = client.get('/api/settings', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    client.post('/api/settings', json={'site_title': 'New Title'})
+    response = client.get('/api/settings', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['site_title'] == 'New Title'
+
+@pytest.mark.parametrize('serving', ['wsgi'], indirect=True)
+def test_settings_snapshot(app, client):
+    from sqlalchemy import event
+    from extensions import db
+    from settings_store import settings_store
+
+    client.post('/auth/register', json={
+        'username': 'admin',
+        'email': 'admin@example.com',
+        'password': 'password'
+    })
+    client.post('/auth/login', json={
+        'username': 'admin',
+        'password': 'password'
+    })
+    client.post('/api/settings', json={'site_title': 'My Blog', 'allow_comments': 'true'})
+    version = settings_store.snapshot().version
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Reads come from memory; an update is one upsert statement
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        assert settings_store.get('site_title') == 'My Blog'
+        assert statements == []
+        settings_store.update({'site_title': 'Renamed', 'comment_approval': 'false'})
+        assert sum(s.startswith('INSERT') for s in statements) == 1
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    snapshot = settings_store.snapshot()
+    assert snapshot.version == version + 1
+    assert dict(snapshot.values) == {'site_title': 'Renamed', 'allow_comments': 'true', 'comment_approval': 'false'}
+
+    # Comments skip moderation once approval is switched off
+    client.post('/auth/register', json={
+        'username': 'user',
+        'email': 'user@example.com',
+        'password': 'password'
+    })
+    client.post('/api/articles', json={'title': 'Article', 'content': 'Content'})
+    client.post('/auth/login', json={
+        'username': 'user',
+        'password': 'password'
+    })
+    response = client.post('/api/comments', json={'content': 'Hi', 'article_id': 1})
+    assert response.json['status'] == 'approved'
+
+def test_settings_update_without_upsert(app, monkeypatch):
+    import settings_store as store
+
+    # Dialects without an upsert update existing keys and insert the rest
+    monkeypatch.setattr(store, '_upsert_statement', lambda rows: None)
+    store.settings_store.update({'site_title': 'My Blog'})
+    store.settings_store.update({'site_title': 'Renamed', 'allow_comments': 'false'})
+    assert dict(store.settings_store.snapshot().values) == {'site_title': 'Renamed', 'allow_comments': 'false'}